@@ -0,0 +1,21 @@
+"""Бот, подключенный к локальным заменам Telegram и Google Sheets
+
+Запускается из bench.run отдельным процессом, чтобы нагрузка
+генератора не искажала замеры. Адреса берутся из BENCH_TELEGRAM_URL
+и BENCH_SHEETS_URL.
+"""
+import asyncio
+import logging
+import os
+
+from aiogram.client.telegram import TelegramAPIServer
+
+from bench.fake_sheets import FakeWorksheet
+from exchange_bot.app import create_app
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    app = create_app()
+    app.bot.session.api = TelegramAPIServer.from_base(os.environ['BENCH_TELEGRAM_URL'])
+    app.sheets_client._sheet = FakeWorksheet(os.environ['BENCH_SHEETS_URL'])
+    asyncio.run(app.run_polling())
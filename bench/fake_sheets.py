@@ -0,0 +1,44 @@
+"""Локальная замена Google Sheets с настраиваемой задержкой
+
+Сервер отдает диапазон курсов как values API, FakeWorksheet ходит к нему
+синхронным HTTP-запросом - так же, как gspread из пула потоков бота.
+"""
+import asyncio
+import json
+import urllib.parse
+import urllib.request
+
+from aiohttp import web
+
+DEFAULT_VALUES = [
+    ['USDT/THB', '31,89'],
+    ['RUB/USDT', '79,50'],
+    ['Комиссия', '0,25%'],
+]
+
+class FakeSheets:
+    def __init__(self, latency: float = 0.0, values=None):
+        self.latency = latency
+        self.values = values or DEFAULT_VALUES
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/values', self._values)
+        return app
+
+    async def _values(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response({'range': request.query.get('range'), 'values': self.values})
+
+class FakeWorksheet:
+    """Лист с интерфейсом gspread, читающий FakeSheets по HTTP"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def get_values(self, range_name: str):
+        url = f"{self.base_url}/values?{urllib.parse.urlencode({'range': range_name})}"
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return json.load(response)['values']
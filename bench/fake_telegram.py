@@ -0,0 +1,97 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов
+
+Принимает запросы бота по адресу /bot<token>/<method>, отдает ему
+обновления через getUpdates и складывает ответы бота в очереди по чатам.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+class FakeTelegramAPI:
+    def __init__(self):
+        self._updates = deque()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self.replies = defaultdict(asyncio.Queue)
+        self.calls = defaultdict(int)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        return app
+
+    def _message(self, chat_id: int, text: str) -> dict:
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'user{chat_id}'},
+            'text': text,
+        }
+
+    def push_message(self, chat_id: int, text: str):
+        """Сообщение от пользователя боту"""
+        self._updates.append({'update_id': next(self._update_ids),
+                              'message': self._message(chat_id, text)})
+        self._new_updates.set()
+
+    def push_callback(self, chat_id: int, data: str):
+        """Нажатие инлайн-кнопки пользователем"""
+        message = self._message(chat_id, '')
+        message['from'] = {'id': 0, 'is_bot': True, 'first_name': 'bot'}
+        self._updates.append({'update_id': next(self._update_ids), 'callback_query': {
+            'id': str(next(self._message_ids)),
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'user{chat_id}'},
+            'chat_instance': str(chat_id),
+            'message': message,
+            'data': data,
+        }})
+        self._new_updates.set()
+
+    async def _get_updates(self, fields) -> list:
+        offset = int(fields.get('offset') or 0)
+        limit = int(fields.get('limit') or 100)
+        timeout = float(fields.get('timeout') or 0)
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, limit))
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        try:
+            fields = await request.post()
+        except ConnectionResetError:
+            # Бот остановлен посреди запроса
+            return web.Response(status=499)
+        self.calls[method] += 1
+
+        if method == 'getme':
+            result = {'id': 123456, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+        elif method == 'getupdates':
+            result = await self._get_updates(fields)
+        elif method in ('sendmessage', 'senddocument', 'editmessagetext'):
+            chat_id = int(fields['chat_id'])
+            message = self._message(chat_id, str(fields.get('text') or fields.get('caption') or ''))
+            result = dict(message)
+            markup = fields.get('reply_markup')
+            if markup:
+                message['reply_markup'] = json.loads(markup)
+                # Telegram возвращает в сообщении только инлайн-клавиатуру
+                if 'inline_keyboard' in message['reply_markup']:
+                    result['reply_markup'] = message['reply_markup']
+            self.replies[chat_id].put_nowait((time.perf_counter(), message))
+        else:
+            # deleteWebhook, answerCallbackQuery, answerInlineQuery и прочее
+            result = True
+        return web.json_response({'ok': True, 'result': result})
@@ -0,0 +1,210 @@
+"""Нагрузочный тест бота без Telegram и Google
+
+    python -m bench.run --users 1000 --sheets-latency 0.3
+
+Поднимает локальные замены Telegram Bot API и Google Sheets, запускает
+бота отдельным процессом и прогоняет через него пользователей по всем
+четырем сценариям и перерасчету (инлайн-кнопками). Каждый пользователь ждет ответа на
+сообщение перед отправкой следующего. В отчете - обновлений в секунду,
+задержки p50/p95/p99 от отправки сообщения до ответа бота и пиковая
+память процесса бота.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+from bench.fake_sheets import FakeSheets
+from bench.fake_telegram import FakeTelegramAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_TOKEN = '123456:bench-token'
+USER_ID_BASE = 100000
+
+class Press(str):
+    """Нажатие инлайн-кнопки с данными callback"""
+
+# Последовательности действий пользователя
+FLOWS = {
+    'scenario1': ["💰 Рубли + Курс → Баты", "50000", "2.6", Press("rc:rate"), "2.7"],
+    'scenario2': ["🇹🇭 Баты + Курс → Рубли", "10000", "2.6", Press("rc:baht"), "12000"],
+    'scenario3': ["📊 Рубли + Профит → Баты", "50000", "500", Press("rc:profit"), "700"],
+    'scenario4': ["💵 Баты + Профит → Рубли", "10000", "300", Press("rc:baht"), "9000"],
+    'rates': ["📈 Текущие курсы"],
+}
+
+async def start_server(app: web.Application):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def peak_memory_kb(pid: int) -> int:
+    """Пиковый RSS процесса (Linux)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+class User:
+    def __init__(self, api: FakeTelegramAPI, user_id: int, timeout: float):
+        self.api = api
+        self.user_id = user_id
+        self.timeout = timeout
+
+    async def say(self, text: str) -> float:
+        """Отправить сообщение или нажать кнопку и дождаться ответа; вернуть задержку"""
+        start = time.perf_counter()
+        if isinstance(text, Press):
+            self.api.push_callback(self.user_id, text)
+        else:
+            self.api.push_message(self.user_id, text)
+        received_at, _ = await asyncio.wait_for(self.api.replies[self.user_id].get(), self.timeout)
+        return received_at - start
+
+async def run_user(user: User, rounds: int, latencies: dict, errors: list):
+    for _ in range(rounds):
+        for name, steps in FLOWS.items():
+            for text in steps:
+                try:
+                    latencies.setdefault(name, []).append(await user.say(text))
+                except asyncio.TimeoutError:
+                    errors.append((user.user_id, name, text))
+                    return
+
+async def benchmark(args) -> dict:
+    api = FakeTelegramAPI()
+    sheets = FakeSheets(latency=args.sheets_latency)
+    telegram_runner, telegram_url = await start_server(api.app())
+    sheets_runner, sheets_url = await start_server(sheets.app())
+    # Файлы бота (история курсов, подписки, очередь сделок) - во временном каталоге, а не в репозитории
+    workdir = tempfile.mkdtemp(prefix='bench-')
+
+    env = dict(os.environ)
+    env.update(
+        BOT_TOKEN=BENCH_TOKEN,
+        BENCH_TELEGRAM_URL=telegram_url,
+        BENCH_SHEETS_URL=sheets_url,
+        RATES_TTL=str(args.rates_ttl),
+        FSM_STORAGE=args.fsm_storage,
+        FSM_SQLITE_PATH=args.sqlite_path or os.path.join(workdir, 'fsm.sqlite3'),
+        RATES_HISTORY_PATH=os.path.join(workdir, 'rates_history.bin'),
+        SUBSCRIPTIONS_PATH=os.path.join(workdir, 'subscriptions.sqlite3'),
+        DEALS_QUEUE_PATH=os.path.join(workdir, 'deals.sqlite3'),
+        THROTTLE_SQLITE_PATH=os.path.join(workdir, 'throttle.sqlite3'),
+        METRICS_PORT='0',
+        PYTHONPATH=ROOT,
+    )
+    if not args.respect_limits:
+        # Лимиты Telegram и защита от флуда ограничили бы пропускную способность, а не бота
+        env.update(SEND_GLOBAL_RATE='1e9', SEND_CHAT_RATE='1e9', SEND_CHAT_BURST='1e9',
+                   SEND_GROUP_RATE='1e9', THROTTLE_LIMIT='0')
+
+    started = time.perf_counter()
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'bench.bot_process', cwd=workdir, env=env,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=None if args.verbose else asyncio.subprocess.DEVNULL
+    )
+    try:
+        # Первый ответ - бот запущен и кэш курсов прогрет
+        await User(api, USER_ID_BASE - 1, args.timeout).say('/start')
+        startup_seconds = time.perf_counter() - started
+        sheets_requests_at_start = sheets.requests
+
+        latencies, errors = {}, []
+        users = [User(api, USER_ID_BASE + i, args.timeout) for i in range(args.users)]
+        begin = time.perf_counter()
+        await asyncio.gather(*(run_user(user, args.rounds, latencies, errors) for user in users))
+        elapsed = time.perf_counter() - begin
+        memory_kb = peak_memory_kb(bot.pid)
+    finally:
+        if bot.returncode is None:
+            bot.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(bot.wait(), 10)
+            except asyncio.TimeoutError:
+                bot.kill()
+        await telegram_runner.cleanup()
+        await sheets_runner.cleanup()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        'users': args.users,
+        'updates': len(everything),
+        'errors': len(errors),
+        'elapsed_seconds': round(elapsed, 3),
+        'updates_per_second': round(len(everything) / elapsed, 1) if elapsed else 0,
+        'latency_ms': {
+            name: {
+                'p50': round(percentile(values, 0.50) * 1000, 2),
+                'p95': round(percentile(values, 0.95) * 1000, 2),
+                'p99': round(percentile(values, 0.99) * 1000, 2),
+            }
+            for name, values in [('all', everything)] + sorted(latencies.items())
+        },
+        'bot_peak_memory_mb': round(memory_kb / 1024, 1),
+        'bot_startup_seconds': round(startup_seconds, 3),
+        'sheets_requests': sheets.requests - sheets_requests_at_start,
+        'telegram_calls': dict(api.calls),
+    }
+
+def print_report(report: dict):
+    print(f"Пользователей: {report['users']}, обновлений: {report['updates']}, "
+          f"ошибок: {report['errors']}")
+    print(f"Время: {report['elapsed_seconds']} с, "
+          f"пропускная способность: {report['updates_per_second']} обновлений/с")
+    print(f"Пиковая память бота: {report['bot_peak_memory_mb']} МБ, "
+          f"первый ответ через {report['bot_startup_seconds']} с после запуска, "
+          f"запросов к Sheets под нагрузкой: {report['sheets_requests']}")
+    print(f"{'поток':<12}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for name, values in report['latency_ms'].items():
+        print(f"{name:<12}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200, help='число пользователей')
+    parser.add_argument('--rounds', type=int, default=1, help='проходов всех сценариев на пользователя')
+    parser.add_argument('--sheets-latency', type=float, default=0.2, help='задержка Sheets, с')
+    parser.add_argument('--rates-ttl', type=float, default=60, help='RATES_TTL бота, с')
+    parser.add_argument('--fsm-storage', default='memory', choices=('memory', 'sqlite', 'redis'))
+    parser.add_argument('--sqlite-path', default='',
+                        help='файл SQLite для FSM; по умолчанию новый во временном каталоге')
+    parser.add_argument('--respect-limits', action='store_true',
+                        help='оставить лимиты отправки Telegram и частоты сообщений включенными')
+    parser.add_argument('--timeout', type=float, default=30, help='ожидание ответа, с')
+    parser.add_argument('--json', help='сохранить отчет в файл')
+    parser.add_argument('--verbose', action='store_true', help='показывать журнал бота')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(benchmark(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
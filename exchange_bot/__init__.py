@@ -0,0 +1,9 @@
+"""Telegram-бот для расчета обмена RUB → USDT → THB
+
+Расчеты (pricing), шаблоны и хранилища импортируются без токена и без
+запуска бота; приложение собирает app.create_app().
+"""
+import time
+
+# Момент импорта пакета - от него считается время запуска
+STARTED_AT = time.monotonic()
@@ -0,0 +1,4 @@
+"""Запуск: python -m exchange_bot"""
+from .app import main
+
+main()
@@ -0,0 +1,284 @@
+"""Сборка приложения: бот, диспетчер и сервисы одного процесса
+
+create_app() создает все объекты по настройкам из config и ничего не
+запускает. При запуске кэш курсов прогревается до приема обновлений, а
+время запуска пишется в лог и в метрику bot_startup_seconds.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from aiogram import Bot, Dispatcher
+
+from . import STARTED_AT
+from . import bulk
+from . import config
+from . import handlers
+from . import inline
+from . import ledger
+from . import metrics
+from . import rates
+from . import routes
+from . import sender
+from . import subscriptions
+from . import templates
+from . import throttling
+from .breaker import CircuitBreaker
+from .history import RateHistory
+from .storage import CalculationStore, SQLiteCalculationBackend, create_isolation, create_storage
+from .webhook import ConcurrencyLimitMiddleware, run_webhook
+
+logger = logging.getLogger(__name__)
+
+def process_uptime() -> float:
+    """Секунды с запуска процесса; без /proc - с импорта пакета"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Поле 22 - время запуска в тиках с загрузки системы; имя процесса в скобках
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic() - STARTED_AT
+
+class BotApp:
+    """Бот, диспетчер и сервисы процесса; обработчики получают его аргументом app"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, *, sheets_client, sheets_executor, rate_cache,
+                 storage, send_queue, last_calculation, subscription_store, deal_ledger=None,
+                 rate_limiter=None):
+        self.bot = bot
+        self.dp = dp
+        self.sheets_client = sheets_client
+        self.sheets_executor = sheets_executor
+        self.rate_cache = rate_cache
+        self.storage = storage
+        self.send_queue = send_queue
+        self.last_calculation = last_calculation
+        self.subscription_store = subscription_store
+        self.deal_ledger = deal_ledger
+        self.rate_limiter = rate_limiter
+        self.background_tasks = []
+        self.metrics_runner = None
+        self.setup_seconds = 0.0
+        self.warm_up_seconds = 0.0
+        self._warmed_up = False
+
+    async def save_calculation(self, user_id: int, scenario: int, result: dict):
+        """Запомнить расчет для перерасчета и поставить его в журнал сделок"""
+        await self.last_calculation.set(user_id, scenario, result)
+        if self.deal_ledger is not None:
+            self.deal_ledger.record(user_id, scenario, result)
+
+    def on_rates_changed(self, new_rates: rates.ExchangeRates):
+        # Уведомляем только о курсах из таблицы: тестовые, резервные и устаревшие - не изменение курсов
+        if new_rates.source == 'sheets' and not new_rates.stale:
+            subscriptions.notify_subscribers(self.subscription_store, self.send_queue, new_rates)
+
+    async def warm_up(self):
+        """Прогрев кэша курсов; выполняется один раз, даже если таблица недоступна"""
+        if self._warmed_up or self.rate_cache.ready:
+            return
+        self._warmed_up = True
+        start = time.monotonic()
+        await self.rate_cache.try_refresh()
+        self.warm_up_seconds = time.monotonic() - start
+        metrics.STARTUP_SECONDS.labels('warm_up').set(self.warm_up_seconds)
+
+    async def on_startup(self):
+        """Прогрев кэша курсов и фоновые задачи до приема сообщений"""
+        await self.warm_up()
+        self.background_tasks.append(asyncio.create_task(self.rate_cache.run()))
+        self.background_tasks.append(asyncio.create_task(metrics.monitor_event_loop()))
+        if self.deal_ledger is not None:
+            self.background_tasks.append(asyncio.create_task(self.deal_ledger.run()))
+        if config.METRICS_PORT:
+            self.metrics_runner = await metrics.start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
+        total = process_uptime()
+        metrics.STARTUP_SECONDS.labels('total').set(total)
+        logger.info(
+            f"Бот запущен за {total:.2f} с: настройка {self.setup_seconds:.2f} с, "
+            f"прогрев курсов {self.warm_up_seconds:.2f} с"
+        )
+
+    async def on_shutdown(self):
+        for task in self.background_tasks:
+            task.cancel()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        await self.send_queue.close()
+        if self.deal_ledger is not None:
+            # Остаток очереди не теряется: не записанное сейчас уйдет после перезапуска
+            await self.deal_ledger.try_flush()
+            self.deal_ledger.close()
+            self.deal_ledger.executor.shutdown(wait=False)
+        self.sheets_executor.shutdown(wait=False)
+        await self.storage.close()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.close()
+        await self.last_calculation.close()
+        self.subscription_store.close()
+
+    async def run_polling(self):
+        logger.info("Запуск бота...")
+        try:
+            # Кэш курсов прогревается, пока удаляется вебхук
+            await asyncio.gather(self.warm_up(), self.bot.delete_webhook(drop_pending_updates=True))
+            await self.dp.start_polling(self.bot)
+        except Exception as e:
+            logger.error(f"Ошибка запуска: {e}")
+        finally:
+            await self.bot.session.close()
+
+    def run_webhook(self):
+        """Запуск в режиме вебхука, при WEBHOOK_WORKERS > 1 - в нескольких процессах"""
+        if not config.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL не указан")
+        if config.WEBHOOK_WORKERS > 1:
+            # Состояние должно быть общим: обновления одного чата попадают в разные процессы
+            if config.FSM_STORAGE == 'memory':
+                raise ValueError("Для нескольких процессов нужно FSM_STORAGE=redis или sqlite")
+            if config.CHAT_ORDERING and config.FSM_STORAGE != 'redis':
+                # Блокировки SQLite-хранилища живут внутри процесса: обновления одного чата
+                # в разных процессах обрабатывались бы одновременно
+                raise ValueError("Очередность обновлений чата в нескольких процессах требует "
+                                 "FSM_STORAGE=redis; иначе отключите ее: CHAT_ORDERING=0")
+            if not config.LAST_CALC_SQLITE_PATH:
+                raise ValueError("Для нескольких процессов нужно указать LAST_CALC_SQLITE_PATH")
+            if not config.RATES_SHARED_PATH:
+                logger.warning("RATES_SHARED_PATH не указан: каждый процесс читает курсы сам")
+            if self.rate_limiter is not None and config.THROTTLE_STORAGE == 'memory':
+                logger.warning("THROTTLE_STORAGE=memory: лимит частоты считается в каждом процессе отдельно")
+            # Копия в памяти процесса может устареть - всегда читаем из общей базы
+            self.last_calculation.max_size = 0
+
+        logger.info("Запуск бота (webhook)...")
+        run_webhook(self.bot, self.dp, url=config.WEBHOOK_URL + config.WEBHOOK_PATH,
+                    host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT, path=config.WEBHOOK_PATH,
+                    secret=config.WEBHOOK_SECRET, workers=config.WEBHOOK_WORKERS)
+
+def create_app(token: str = None) -> BotApp:
+    """Собрать бота и диспетчер по настройкам из config
+
+    Роутеры и сервисы создаются заново при каждом вызове, поэтому
+    приложений в процессе может быть несколько - например, в тестах.
+    """
+    token = token or config.BOT_TOKEN
+    if not token:
+        raise ValueError("BOT_TOKEN не найден в переменных окружения!")
+
+    # Готовые клавиатуры сериализуются один раз
+    bot = Bot(token=token, session=templates.PrebuiltMarkupSession())
+    outgoing_limiter = sender.OutgoingLimiter(config.SEND_GLOBAL_RATE, config.SEND_CHAT_RATE,
+                                              config.SEND_CHAT_BURST, config.SEND_GROUP_RATE)
+    bot.session.middleware(sender.FloodControlMiddleware(outgoing_limiter, config.SEND_MAX_RETRIES))
+    bot.session.middleware(metrics.TelegramApiMetricsMiddleware())
+    send_queue = sender.SendQueue(bot)
+
+    fsm_storage = create_storage(config.FSM_STORAGE, redis_url=config.REDIS_URL,
+                                 sqlite_path=config.FSM_SQLITE_PATH, ttl=config.FSM_STATE_TTL or None)
+    storage = metrics.InstrumentedStorage(fsm_storage)
+    dp = Dispatcher(storage=storage,
+                    events_isolation=create_isolation(fsm_storage) if config.CHAT_ORDERING else None)
+    # Встроенный FSMContextMiddleware переносится в конец: метрики и защита от флуда
+    # срабатывают раньше блокировки чата и чтения состояния
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(metrics.UpdateMetricsMiddleware())
+    # Флуд отсекается до FSM и ограничения параллельности: лишние обновления не занимают слоты
+    rate_limiter = None
+    if config.THROTTLE_LIMIT:
+        rate_limiter = throttling.create_rate_limiter(
+            config.THROTTLE_STORAGE, config.THROTTLE_LIMIT, config.THROTTLE_WINDOW,
+            redis_url=config.REDIS_URL, sqlite_path=config.THROTTLE_SQLITE_PATH
+        )
+        dp.update.outer_middleware(throttling.ThrottlingMiddleware(rate_limiter, config.THROTTLE_ALLOWLIST))
+    dp.update.outer_middleware(dp.fsm)
+    if config.MAX_CONCURRENT_UPDATES:
+        dp.update.outer_middleware(ConcurrencyLimitMiddleware(config.MAX_CONCURRENT_UPDATES))
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(metrics.HandlerMetricsMiddleware())
+
+    # Курсы: таблица читается в пуле потоков, снимок живет в кэше
+    try:
+        sheets_client = rates.SheetsClient(config.GOOGLE_CREDENTIALS, config.SPREADSHEET_ID,
+                                           timeout=config.SHEETS_TIMEOUT)
+    except ValueError as e:
+        logger.error(f"Некорректный GOOGLE_CREDENTIALS_JSON: {e}")
+        sheets_client = rates.SheetsClient(None, config.SPREADSHEET_ID, timeout=config.SHEETS_TIMEOUT)
+    sheets_executor = ThreadPoolExecutor(max_workers=config.SHEETS_WORKERS, thread_name_prefix='sheets')
+    rate_source = rates.RateSource(
+        sheets_client, config.RATES_RANGE, sheets_executor,
+        max_concurrency=config.SHEETS_MAX_CONCURRENCY,
+        timeout=config.SHEETS_TIMEOUT,
+        history=RateHistory(config.RATES_HISTORY_PATH) if config.RATES_HISTORY_PATH else None,
+        shared=rates.SharedRateSnapshot(config.RATES_SHARED_PATH, config.RATES_TTL)
+        if config.RATES_SHARED_PATH else None,
+        secondary=rates.FileRateSource(config.RATES_FALLBACK_PATH) if config.RATES_FALLBACK_PATH else None,
+        breaker=CircuitBreaker("Google Sheets", config.RATES_BREAKER_FAILURES, config.RATES_BREAKER_RESET)
+    )
+    # Пока таблица недоступна, кэш отдает последний известный или резервный снимок
+    rate_cache = rates.RateCache(config.RATES_TTL, rate_source.fetch, fallback=rate_source.fallback,
+                                 retry_interval=config.RATES_RETRY_INTERVAL)
+
+    last_calculation = CalculationStore(
+        config.LAST_CALC_MAX_USERS,
+        ttl=config.LAST_CALC_TTL or None,
+        backend=SQLiteCalculationBackend(config.LAST_CALC_SQLITE_PATH) if config.LAST_CALC_SQLITE_PATH else None
+    )
+
+    # Журнал сделок; у записи свой поток, чтобы зависшая выгрузка не занимала потоки чтения курсов
+    deal_ledger = None
+    if config.DEALS_WORKSHEET and sheets_client.configured:
+        deal_ledger = ledger.DealLedger(
+            ledger.DealQueue(config.DEALS_QUEUE_PATH),
+            partial(sheets_client.append_rows, config.DEALS_WORKSHEET, ledger.LEDGER_COLUMNS),
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix='deals'),
+            batch_size=config.DEALS_BATCH_SIZE,
+            flush_interval=config.DEALS_FLUSH_INTERVAL,
+            timeout=config.SHEETS_TIMEOUT
+        )
+
+    app = BotApp(
+        bot, dp,
+        sheets_client=sheets_client,
+        sheets_executor=sheets_executor,
+        rate_cache=rate_cache,
+        storage=storage,
+        send_queue=send_queue,
+        last_calculation=last_calculation,
+        subscription_store=subscriptions.SubscriptionStore(config.SUBSCRIPTIONS_PATH),
+        deal_ledger=deal_ledger,
+        rate_limiter=rate_limiter
+    )
+    rate_cache.listeners.append(app.on_rates_changed)
+
+    # Передаются обработчикам аргументами с теми же именами
+    dp['app'] = app
+    dp['rate_cache'] = rate_cache
+    dp['send_queue'] = send_queue
+    dp['subscriptions'] = app.subscription_store
+    dp['bulk_limits'] = bulk.BulkLimits(config.BULK_CHUNK, config.BULK_TEXT_LIMIT)
+    dp['inline_quotes'] = inline.InlineQuotes(config.INLINE_MEMO_SIZE, config.INLINE_CACHE_TIME)
+    dp['route_engine'] = routes.RouteEngine()
+
+    # Сценарии расчета, пакетный расчет, инлайн-режим, маршруты между валютами и подписки
+    dp.include_routers(handlers.build_router(), bulk.build_router(), inline.build_router(),
+                       routes.build_router(), subscriptions.build_router())
+    dp.startup.register(app.on_startup)
+    dp.shutdown.register(app.on_shutdown)
+
+    app.setup_seconds = process_uptime()
+    metrics.STARTUP_SECONDS.labels('setup').set(app.setup_seconds)
+    return app
+
+def main():
+    """Точка входа: режим работы выбирается переменной BOT_MODE"""
+    logging.basicConfig(level=logging.INFO)
+    app = create_app()
+    if config.BOT_MODE == 'webhook':
+        app.run_webhook()
+    else:
+        asyncio.run(app.run_polling())
@@ -0,0 +1,63 @@
+"""Предохранитель (circuit breaker) для внешнего источника
+
+После failure_threshold ошибок подряд цепь размыкается: вызовы
+отклоняются сразу, без ожидания таймаута. Через reset_timeout секунд
+пропускается один пробный вызов - успех замыкает цепь, ошибка
+размыкает ее снова на reset_timeout.
+"""
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Состояние цепи одного источника; вызывается из event loop"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def closed(self) -> bool:
+        return self.opened_at is None
+
+    @property
+    def retry_in(self) -> float:
+        """Через сколько секунд будет пропущен пробный вызов"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов сейчас"""
+        if self.opened_at is None:
+            return True
+        if self._probing or self.retry_in > 0:
+            return False
+        # Полуоткрытое состояние: пробует только один вызов
+        self._probing = True
+        return True
+
+    def record(self, ok: bool):
+        """Итог разрешенного вызова"""
+        self._probing = False
+        if ok:
+            if self.opened_at is not None:
+                logger.info(f"{self.name}: источник снова доступен")
+            self.failures = 0
+            self.opened_at = None
+            return
+
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(
+                    f"{self.name}: {self.failures} ошибок подряд, "
+                    f"запросы приостановлены на {self.reset_timeout:.0f} с"
+                )
+            self.opened_at = time.monotonic()
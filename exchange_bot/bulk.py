@@ -0,0 +1,248 @@
+"""Пакетный расчет: список сумм сообщением или CSV-файлом
+
+Каждая строка - сумма и второй параметр сценария (курс или профит).
+Строки читаются и считаются порциями, результат пишется во временный
+файл, поэтому большой CSV не загружается в память целиком. Разбор,
+расчет и запись файла занимают секунды на сотнях тысяч строк, поэтому
+идут в пуле потоков, а не в event loop. Все строки одного запроса
+считаются по одному снимку курсов. Размеры порций приходят из create_app
+аргументом bulk_limits.
+"""
+import asyncio
+import csv
+import os
+import re
+import tempfile
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from aiogram import Bot, F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import FSInputFile
+
+from . import pricing
+from . import sender
+from . import templates
+
+class BulkLimits(NamedTuple):
+    # Сколько строк считать за один вызов пакетной функции
+    chunk: int = 4096
+    # До скольки строк отвечать таблицей в сообщении, дальше - CSV-файлом
+    text_limit: int = 30
+
+# Сценарий → подписи входных колонок
+BULK_INPUTS = {
+    1: ('рубли', 'курс'),
+    2: ('баты', 'курс'),
+    3: ('рубли', 'профит'),
+    4: ('баты', 'профит'),
+}
+
+# Колонки с курсами выводятся с четырьмя знаками
+RATE_COLUMNS = {'client_rate', 'real_rate'}
+
+class BulkStates(StatesGroup):
+    waiting_input = State()
+
+def _number(value: str) -> float:
+    return float(value.strip().replace('\xa0', '').replace(' ', '').replace(',', '.'))
+
+def parse_rows(rows):
+    """Пары (сумма, параметр) из строк; некорректные строки - None"""
+    for row in rows:
+        try:
+            yield _number(row[0]), _number(row[1])
+        except (ValueError, IndexError):
+            yield None
+
+def split_text_lines(text: str):
+    """Строки сообщения: два числа через точку с запятой, табуляцию или пробел"""
+    return split_lines(text.splitlines())
+
+def split_lines(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if ';' in line or '\t' in line:
+            yield re.split(r'[;\t]', line, maxsplit=1)
+        else:
+            # Пробелы могут разделять разряды: параметр - последнее число
+            yield line.rsplit(maxsplit=1)
+
+def quote_rows(rates, scenario: int, pairs, chunk_size: int = BulkLimits().chunk):
+    """Расчет порциями по chunk_size строк: (номер строки, результат или None)"""
+    batch = pricing.BATCH_SCENARIOS[scenario]
+    pairs = iter(pairs)
+    line_no = 0
+    while True:
+        chunk = list(islice(pairs, chunk_size))
+        if not chunk:
+            return
+        valid = [pair for pair in chunk if pair is not None]
+        if valid:
+            amounts, params = zip(*valid)
+            columns = batch(rates, amounts, params)
+            results = iter([dict(zip(columns, values)) for values in zip(*columns.values())])
+        for pair in chunk:
+            line_no += 1
+            yield line_no, next(results) if pair is not None else None
+
+def result_columns(rates, scenario: int):
+    """Названия колонок результата сценария"""
+    return list(pricing.BATCH_SCENARIOS[scenario](rates, [], []))
+
+def write_csv(rows, path: str, columns) -> int:
+    """Запись результатов в CSV; возвращает число посчитанных строк"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['строка'] + list(columns) + ['ошибка'])
+        for line_no, result in rows:
+            if result is None:
+                writer.writerow([line_no] + [''] * len(columns) + ['не число'])
+            else:
+                writer.writerow([line_no] + [f"{value:.4f}" for value in result.values()] + [''])
+                count += 1
+    return count
+
+def write_quotes(rates, scenario: int, rows, path: str, chunk_size: int) -> int:
+    """Разбор строк, расчет и запись CSV (вызывается из пула потоков)"""
+    return write_csv(quote_rows(rates, scenario, parse_rows(rows), chunk_size), path,
+                     result_columns(rates, scenario))
+
+def format_table(rows, columns) -> str:
+    """Результаты в виде моноширинной таблицы"""
+    lines = [f"{'#':>3} " + " ".join(f"{name:>14}" for name in columns)]
+    for line_no, result in rows:
+        if result is None:
+            lines.append(f"{line_no:>3} ❌ не число")
+        else:
+            lines.append(f"{line_no:>3} " + " ".join(
+                f"{value:>14,.4f}" if name in RATE_COLUMNS else f"{value:>14,.2f}"
+                for name, value in result.items()
+            ))
+    return "\n".join(lines)
+
+def sniff_delimiter(lines) -> Optional[str]:
+    """Разделитель колонок CSV или None, если строки нужно разбирать как текст
+
+    Русский Excel сохраняет CSV через «;» с десятичной запятой
+    («50000;2,6»), а вручную набранный файл похож на сообщение
+    («50000 2,6»). Поэтому запятая считается разделителем, только если
+    делит каждую строку ровно на две колонки и других разделителей в
+    строках нет - иначе она скорее отделяет дробь.
+    """
+    lines = [line.strip() for line in lines if line.strip()]
+    for delimiter in (';', '\t'):
+        if lines and all(delimiter in line for line in lines):
+            return delimiter
+    if lines and all(line.count(',') == 1 and len(line.split()) == 1 for line in lines):
+        return ','
+    return None
+
+def _csv_rows(path: str):
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        lines = sample.splitlines()
+        if len(sample) == 4096 and len(lines) > 1:
+            # Последняя строка образца может быть обрезана
+            lines.pop()
+        delimiter = sniff_delimiter(lines)
+        if delimiter is None:
+            # Разделители вперемешку или пробелы - как строки сообщения
+            yield from split_lines(f)
+        else:
+            yield from csv.reader(f, delimiter=delimiter)
+
+async def bulk_start(message: types.Message, state: FSMContext, command: CommandObject):
+    """Начало пакетного расчета: /bulk <номер сценария>"""
+    try:
+        scenario = int(command.args or '')
+        inputs = BULK_INPUTS[scenario]
+    except (ValueError, KeyError):
+        await message.answer(
+            "Укажите сценарий: /bulk 1, /bulk 2, /bulk 3 или /bulk 4\n\n"
+            "1 - рубли + курс, 2 - баты + курс, 3 - рубли + профит, 4 - баты + профит"
+        )
+        return
+
+    await state.set_state(BulkStates.waiting_input)
+    await state.update_data(scenario=scenario)
+    await message.answer(
+        f"📋 <b>Пакетный расчет, сценарий {scenario}</b>\n\n"
+        f"Отправьте строки вида «{inputs[0]} {inputs[1]}» (по одной на строку) "
+        f"или CSV-файл с двумя колонками.",
+        parse_mode="HTML",
+        reply_markup=templates.REMOVE_KEYBOARD
+    )
+
+async def bulk_document(message: types.Message, state: FSMContext, bot: Bot, rate_cache,
+                        bulk_limits: BulkLimits):
+    """Расчет по загруженному CSV"""
+    scenario = (await state.get_data())['scenario']
+    rates = rate_cache.get()
+
+    source = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+    source.close()
+    target = source.name + '.out.csv'
+    try:
+        await bot.download(message.document, destination=source.name)
+        count = await asyncio.get_running_loop().run_in_executor(
+            None, write_quotes, rates, scenario, _csv_rows(source.name), target, bulk_limits.chunk
+        )
+        await state.clear()
+        with sender.priority(sender.HIGH):
+            await message.answer_document(
+                FSInputFile(target, filename=f"quotes_{scenario}.csv"),
+                caption=f"✅ Посчитано строк: {count}" + templates.rates_notice(rates),
+                parse_mode="HTML"
+            )
+    finally:
+        for path in (source.name, target):
+            if os.path.exists(path):
+                os.remove(path)
+
+async def bulk_text(message: types.Message, state: FSMContext, rate_cache, bulk_limits: BulkLimits):
+    """Расчет по списку в сообщении
+
+    Команды сюда не попадают: /quote и подписки работают и посреди
+    пакетного расчета, хотя роутер bulk подключен раньше их роутеров.
+    """
+    scenario = (await state.get_data())['scenario']
+    rates = rate_cache.get()
+    rows = split_text_lines(message.text)
+    await state.clear()
+
+    if message.text.count('\n') < bulk_limits.text_limit:
+        table = format_table(quote_rows(rates, scenario, parse_rows(rows), bulk_limits.chunk),
+                             result_columns(rates, scenario))
+        with sender.priority(sender.HIGH):
+            await message.answer(f"<pre>{table}</pre>" + templates.rates_notice(rates), parse_mode="HTML")
+        return
+
+    target = tempfile.NamedTemporaryFile(suffix='.csv', delete=False)
+    target.close()
+    try:
+        count = await asyncio.get_running_loop().run_in_executor(
+            None, write_quotes, rates, scenario, rows, target.name, bulk_limits.chunk
+        )
+        with sender.priority(sender.HIGH):
+            await message.answer_document(
+                FSInputFile(target.name, filename=f"quotes_{scenario}.csv"),
+                caption=f"✅ Посчитано строк: {count}" + templates.rates_notice(rates),
+                parse_mode="HTML"
+            )
+    finally:
+        os.remove(target.name)
+
+def build_router() -> Router:
+    """Роутер /bulk и ввода списка или CSV-файла"""
+    router = Router(name=__name__)
+    router.message.register(bulk_start, Command("bulk"))
+    router.message.register(bulk_document, BulkStates.waiting_input, F.document)
+    router.message.register(bulk_text, BulkStates.waiting_input, F.text, ~F.text.startswith('/'))
+    return router
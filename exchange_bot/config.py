@@ -0,0 +1,108 @@
+"""Настройки из переменных окружения
+
+Модуль только читает переменные: токен проверяется при создании
+приложения, поэтому расчеты и шаблоны можно импортировать без него.
+Сразу проверяются лишь значения, от которых зависит импорт модулей
+(правило округления PRICING_ROUNDING).
+"""
+import decimal
+import os
+
+# Токен бота; проверяется при создании приложения
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# Настройка Google Sheets
+GOOGLE_CREDENTIALS = os.getenv('GOOGLE_CREDENTIALS_JSON')
+SPREADSHEET_ID = os.getenv('SPREADSHEET_ID', '')
+
+# Время жизни снимка курсов в секундах
+RATES_TTL = float(os.getenv('RATES_TTL', '60'))
+# Таймаут одного запроса к Google Sheets и размер пула потоков для gspread
+SHEETS_TIMEOUT = float(os.getenv('SHEETS_TIMEOUT', '10'))
+SHEETS_WORKERS = int(os.getenv('SHEETS_WORKERS', '2'))
+# Максимум одновременных запросов к Google Sheets
+SHEETS_MAX_CONCURRENCY = int(os.getenv('SHEETS_MAX_CONCURRENCY', '1'))
+# Диапазон с курсами: столбец A - подписи, B - значения, C - комиссии пар
+RATES_RANGE = os.getenv('RATES_RANGE', 'A2:C20')
+# Файл со снимком курсов, общий для нескольких процессов (пусто - не используется)
+RATES_SHARED_PATH = os.getenv('RATES_SHARED_PATH', '')
+# После скольких ошибок подряд приостановить запросы к таблице и на сколько секунд
+RATES_BREAKER_FAILURES = int(os.getenv('RATES_BREAKER_FAILURES', '3'))
+RATES_BREAKER_RESET = float(os.getenv('RATES_BREAKER_RESET', '30'))
+# Как часто проверять таблицу, пока она недоступна
+RATES_RETRY_INTERVAL = float(os.getenv('RATES_RETRY_INTERVAL', '10'))
+# Резервный файл с курсами, JSON или CSV (пусто - не используется)
+RATES_FALLBACK_PATH = os.getenv('RATES_FALLBACK_PATH', '')
+# Лист журнала сделок (пусто - не вести журнал) и локальная очередь к нему
+DEALS_WORKSHEET = os.getenv('DEALS_WORKSHEET', 'deals')
+DEALS_QUEUE_PATH = os.getenv('DEALS_QUEUE_PATH', 'deals.sqlite3')
+# Запись в таблицу пакетами: по размеру или раз в интервал, что наступит раньше
+DEALS_BATCH_SIZE = int(os.getenv('DEALS_BATCH_SIZE', '100'))
+DEALS_FLUSH_INTERVAL = float(os.getenv('DEALS_FLUSH_INTERVAL', '30'))
+# Файл SQLite с подписками на изменение курсов
+SUBSCRIPTIONS_PATH = os.getenv('SUBSCRIPTIONS_PATH', 'subscriptions.sqlite3')
+# Файл истории курсов (пусто - не вести историю)
+RATES_HISTORY_PATH = os.getenv('RATES_HISTORY_PATH', 'rates_history.bin')
+
+# FSM-хранилище: memory, redis или sqlite
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'memory')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+FSM_SQLITE_PATH = os.getenv('FSM_SQLITE_PATH', 'fsm.sqlite3')
+# Через сколько секунд брошенный расчет забывается
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', '86400'))
+
+# Режим работы: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('PORT', '8080'))
+# Число процессов, принимающих вебхук на одном порту
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '1'))
+# Обрабатывать обновления одного чата строго по очереди
+CHAT_ORDERING = os.getenv('CHAT_ORDERING', '1') == '1'
+# Максимум одновременно обрабатываемых обновлений в процессе (0 - без ограничения)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '0'))
+
+# Не больше THROTTLE_LIMIT обновлений от пользователя за THROTTLE_WINDOW секунд (0 - без ограничения)
+THROTTLE_LIMIT = int(os.getenv('THROTTLE_LIMIT', '20'))
+THROTTLE_WINDOW = float(os.getenv('THROTTLE_WINDOW', '10'))
+# Где считать обновления: memory, redis или sqlite (для нескольких процессов)
+THROTTLE_STORAGE = os.getenv('THROTTLE_STORAGE', 'memory')
+THROTTLE_SQLITE_PATH = os.getenv('THROTTLE_SQLITE_PATH', 'throttle.sqlite3')
+# Операторы без ограничения: id пользователей через запятую
+THROTTLE_ALLOWLIST = frozenset(
+    int(user_id) for user_id in os.getenv('THROTTLE_ALLOWLIST', '').replace(' ', '').split(',') if user_id
+)
+
+# Адрес HTTP-эндпоинта /metrics (порт 0 - метрики не отдаются)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# Лимиты исходящих сообщений (Telegram: ~30 в секунду на бота, ~1 в секунду на чат)
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', '25'))
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', '1'))
+SEND_CHAT_BURST = float(os.getenv('SEND_CHAT_BURST', '3'))
+SEND_GROUP_RATE = float(os.getenv('SEND_GROUP_RATE', '0.33'))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))
+
+# Последние расчеты пользователей для перерасчета
+LAST_CALC_MAX_USERS = int(os.getenv('LAST_CALC_MAX_USERS', '10000'))
+LAST_CALC_TTL = int(os.getenv('LAST_CALC_TTL', '86400'))
+# Файл SQLite для хранения расчетов между перезапусками (пусто - только память)
+LAST_CALC_SQLITE_PATH = os.getenv('LAST_CALC_SQLITE_PATH', '')
+
+# Пакетный расчет: строк за один вызов пакетной функции и до скольки строк отвечать таблицей
+BULK_CHUNK = int(os.getenv('BULK_CHUNK', '4096'))
+BULK_TEXT_LIMIT = int(os.getenv('BULK_TEXT_LIMIT', '30'))
+# Инлайн-режим: сколько секунд Telegram кэширует ответ и сколько ответов хранить в памяти
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', '30'))
+INLINE_MEMO_SIZE = int(os.getenv('INLINE_MEMO_SIZE', '1024'))
+
+# Правило округления денег и курсов: ROUND_HALF_UP, ROUND_HALF_EVEN, ROUND_DOWN...
+PRICING_ROUNDING = os.getenv('PRICING_ROUNDING', 'ROUND_HALF_UP')
+ROUNDING_MODES = sorted(name for name in dir(decimal) if name.startswith('ROUND_'))
+if PRICING_ROUNDING not in ROUNDING_MODES:
+    raise ValueError(f"Неизвестное правило округления PRICING_ROUNDING={PRICING_ROUNDING!r}, "
+                     f"допустимы: {', '.join(ROUNDING_MODES)}")
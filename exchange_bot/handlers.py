@@ -0,0 +1,374 @@
+"""Обработчики сценариев расчета, перерасчета и главного меню
+
+Сервисы приложения (кэш курсов, последние расчеты, журнал сделок)
+приходят в обработчики аргументом app - см. app.BotApp.
+"""
+import logging
+from typing import Optional
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, ExceptionTypeFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+
+from . import pricing
+from . import sender
+from . import templates
+from .rates import RatesUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Состояния для FSM
+class CalculationStates(StatesGroup):
+    # Сценарий 1: рубли + курс → баты + профит
+    waiting_rubles_1 = State()
+    waiting_rate_1 = State()
+    
+    # Сценарий 2: баты + курс → рубли + профит
+    waiting_baht_2 = State()
+    waiting_rate_2 = State()
+    
+    # Сценарий 3: рубли + профит → баты + курс
+    waiting_rubles_3 = State()
+    waiting_profit_3 = State()
+    
+    # Сценарий 4: баты + профит → рубли + курс
+    waiting_baht_4 = State()
+    waiting_profit_4 = State()
+    
+    # Состояния для перерасчета
+    recalc_waiting_value = State()
+
+# Обработчики команд
+async def cmd_start(message: types.Message, state: FSMContext):
+    """Команда /start"""
+    await state.clear()
+    await message.answer(
+        "👋 Привет! Я бот для расчета обмена RUB → USDT → THB\n\n"
+        "Выберите нужный сценарий расчета:\n"
+        "(для пакетного расчета списка сумм - /bulk,\n"
+        "для обмена между любыми валютами - /quote)",
+        reply_markup=templates.MAIN_KEYBOARD
+    )
+
+async def back_to_menu(message: types.Message, state: FSMContext, app):
+    """Возврат в главное меню"""
+    await state.clear()
+    await message.answer("Выберите сценарий:", reply_markup=templates.MAIN_KEYBOARD)
+
+async def show_rates(message: types.Message, state: FSMContext, app):
+    """Показать текущие курсы"""
+    rates = app.rate_cache.get()
+    
+    text = (
+        "📊 <b>Текущие курсы:</b>\n\n"
+        f"USDT → THB: <b>{rates.usdt_thb}</b>\n"
+        f"RUB → USDT: <b>{rates.rub_usdt}</b>\n"
+        f"Комиссия: <b>{rates.commission * 100}%</b>\n\n"
+        f"Итоговый курс RUB/THB: <b>{round(rates.rub_usdt / rates.usdt_thb, 4)}</b>"
+    )
+    if rates.pairs:
+        text += "\n\n" + "\n".join(
+            f"{label}: <b>{value}</b>" for label, value in rates.pairs.items()
+        )
+    text += "\n\n<i>Уведомление об изменении курсов: /subscribe &lt;порог в %&gt;</i>"
+    text += templates.rates_notice(rates)
+    
+    await message.answer(text, parse_mode="HTML")
+
+async def finish_calculation(message: types.Message, state: FSMContext, app, scenario: int, *args,
+                             render=templates.result_text):
+    """Расчет сценария по текущим курсам, сохранение и ответ с кнопками перерасчета
+
+    args - входы сценария в порядке pricing.SCENARIOS, render - шаблон
+    ответа (результат или пересчет).
+    """
+    rates = app.rate_cache.get()
+    result = pricing.SCENARIOS[scenario](rates, *args)
+    await app.save_calculation(message.from_user.id, scenario, result)
+
+    await state.clear()
+    # Результат расчета отправляется раньше меню и рассылок
+    with sender.priority(sender.HIGH):
+        await message.answer(render(scenario, result) + templates.rates_notice(rates), parse_mode="HTML",
+                             reply_markup=templates.RECALC_KEYBOARDS[scenario])
+
+# Сценарий 1: Рубли + Курс → Баты + Профит
+async def scenario1_start(message: types.Message, state: FSMContext, app):
+    """Начало сценария 1"""
+    await state.set_state(CalculationStates.waiting_rubles_1)
+    await message.answer(
+        "💰 <b>Сценарий 1: Рубли + Курс → Баты</b>\n\n"
+        "Введите сумму в рублях:",
+        parse_mode="HTML",
+        reply_markup=templates.REMOVE_KEYBOARD
+    )
+
+async def scenario1_rubles(message: types.Message, state: FSMContext, app):
+    """Получение суммы рублей"""
+    try:
+        rubles = float(message.text.replace(',', '.'))
+        await state.update_data(rubles=rubles)
+        await state.set_state(CalculationStates.waiting_rate_1)
+        await message.answer("Введите курс для клиента (например, 2.6):")
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число (например: 50000 или 50000.5)")
+
+async def scenario1_rate(message: types.Message, state: FSMContext, app):
+    """Получение курса и расчет"""
+    try:
+        rate = float(message.text.replace(',', '.'))
+        data = await state.get_data()
+        await finish_calculation(message, state, app, 1, data['rubles'], rate)
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число (например: 2.6)")
+
+# Сценарий 2: Баты + Курс → Рубли + Профит
+async def scenario2_start(message: types.Message, state: FSMContext, app):
+    """Начало сценария 2"""
+    await state.set_state(CalculationStates.waiting_baht_2)
+    await message.answer(
+        "🇹🇭 <b>Сценарий 2: Баты + Курс → Рубли</b>\n\n"
+        "Введите количество батов:",
+        parse_mode="HTML",
+        reply_markup=templates.REMOVE_KEYBOARD
+    )
+
+async def scenario2_baht(message: types.Message, state: FSMContext, app):
+    """Получение батов"""
+    try:
+        baht = float(message.text.replace(',', '.'))
+        await state.update_data(baht=baht)
+        await state.set_state(CalculationStates.waiting_rate_2)
+        await message.answer("Введите курс для клиента:")
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+
+async def scenario2_rate(message: types.Message, state: FSMContext, app):
+    """Получение курса и расчет"""
+    try:
+        rate = float(message.text.replace(',', '.'))
+        data = await state.get_data()
+        await finish_calculation(message, state, app, 2, data['baht'], rate)
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+
+# Сценарий 3: Рубли + Профит → Баты + Курс
+async def scenario3_start(message: types.Message, state: FSMContext, app):
+    """Начало сценария 3"""
+    await state.set_state(CalculationStates.waiting_rubles_3)
+    await message.answer(
+        "📊 <b>Сценарий 3: Рубли + Профит → Баты</b>\n\n"
+        "Введите сумму в рублях:",
+        parse_mode="HTML",
+        reply_markup=templates.REMOVE_KEYBOARD
+    )
+
+async def scenario3_rubles(message: types.Message, state: FSMContext, app):
+    """Получение рублей"""
+    try:
+        rubles = float(message.text.replace(',', '.'))
+        await state.update_data(rubles=rubles)
+        await state.set_state(CalculationStates.waiting_profit_3)
+        await message.answer("Введите желаемый профит в батах:")
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+
+async def scenario3_profit(message: types.Message, state: FSMContext, app):
+    """Получение профита и расчет"""
+    try:
+        profit = float(message.text.replace(',', '.'))
+        data = await state.get_data()
+        await finish_calculation(message, state, app, 3, data['rubles'], profit)
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+
+# Сценарий 4: Баты + Профит → Рубли + Курс
+async def scenario4_start(message: types.Message, state: FSMContext, app):
+    """Начало сценария 4"""
+    await state.set_state(CalculationStates.waiting_baht_4)
+    await message.answer(
+        "💵 <b>Сценарий 4: Баты + Профит → Рубли</b>\n\n"
+        "Введите количество батов:",
+        parse_mode="HTML",
+        reply_markup=templates.REMOVE_KEYBOARD
+    )
+
+async def scenario4_baht(message: types.Message, state: FSMContext, app):
+    """Получение батов"""
+    try:
+        baht = float(message.text.replace(',', '.'))
+        await state.update_data(baht=baht)
+        await state.set_state(CalculationStates.waiting_profit_4)
+        await message.answer("Введите желаемый профит в батах:")
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+
+async def scenario4_profit(message: types.Message, state: FSMContext, app):
+    """Получение профита и расчет"""
+    try:
+        profit = float(message.text.replace(',', '.'))
+        data = await state.get_data()
+        await finish_calculation(message, state, app, 4, data['baht'], profit)
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+
+# Перерасчет
+# Поле перерасчета → ключ в результате расчета и подсказка для ввода
+RECALC_INPUTS = {
+    'rubles': ('rubles', "Введите новую сумму в рублях:"),
+    'baht': ('baht', "Введите новое количество батов:"),
+    'rate': ('client_rate', "Введите новый курс:"),
+    'profit': ('desired_profit', "Введите новый профит:"),
+}
+
+async def start_recalculation(message: types.Message, user_id: int, field: str, state: FSMContext,
+                              app):
+    """Запрос нового значения для перерасчета"""
+    calc_data = await app.last_calculation.get(user_id)
+    if calc_data is None:
+        await message.answer("❌ Нет сохраненных расчетов. Начните новый расчет.")
+        return
+    
+    scenario = calc_data.scenario
+    if field not in dict(templates.RECALC_FIELDS[scenario]):
+        # Кнопка от расчета по другому сценарию
+        await message.answer("❌ Это значение нельзя изменить в последнем расчете.",
+                             reply_markup=templates.RECALC_KEYBOARDS[scenario])
+        return
+    
+    await state.update_data(recalc_type=field, scenario=scenario)
+    await state.set_state(CalculationStates.recalc_waiting_value)
+    await message.answer(RECALC_INPUTS[field][1], reply_markup=templates.REMOVE_KEYBOARD)
+
+async def process_recalculation(message: types.Message, state: FSMContext, app):
+    """Обработка нового значения и пересчет"""
+    try:
+        new_value = float(message.text.replace(',', '.'))
+        data = await state.get_data()
+        recalc_type = data['recalc_type']
+        scenario = data['scenario']
+        
+        user_id = message.from_user.id
+        calc_data = await app.last_calculation.get(user_id)
+        if calc_data is None:
+            await state.clear()
+            await message.answer("❌ Нет сохраненных расчетов. Начните новый расчет.",
+                                 reply_markup=templates.MAIN_KEYBOARD)
+            return
+        old_result = calc_data.result
+        
+        # Новое значение подставляется вместо одного из двух входов сценария
+        args = [new_value if field == recalc_type else old_result[RECALC_INPUTS[field][0]]
+                for field, _ in templates.RECALC_FIELDS[scenario]]
+        await finish_calculation(message, state, app, scenario, *args, render=templates.recalculation_text)
+    
+    except ValueError:
+        await message.answer("❌ Ошибка! Введите число")
+    except RatesUnavailable:
+        # Ответит общий обработчик on_rates_unavailable
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка перерасчета: {e}")
+        await message.answer("❌ Произошла ошибка при пересчете")
+
+# Маршрутизация: таблицы строятся один раз при импорте, поиск - по хэшу
+# Текст кнопки → действие
+TEXT_ACTIONS = {
+    "◀️ Главное меню": back_to_menu,
+    "📈 Текущие курсы": show_rates,
+    "💰 Рубли + Курс → Баты": scenario1_start,
+    "🇹🇭 Баты + Курс → Рубли": scenario2_start,
+    "📊 Рубли + Профит → Баты": scenario3_start,
+    "💵 Баты + Профит → Рубли": scenario4_start,
+}
+
+def _recalc_button(field: str):
+    async def action(message: types.Message, state: FSMContext, app):
+        await start_recalculation(message, message.from_user.id, field, state, app)
+    # Имя попадает в метку метрики обработчика
+    action.__name__ = f"recalc_{field}"
+    return action
+
+# Кнопки перерасчета со старых текстовых клавиатур, оставшихся в чатах
+TEXT_ACTIONS.update({
+    label: _recalc_button(field) for fields in templates.RECALC_FIELDS.values() for field, label in fields
+})
+
+# Состояние → обработчик ввода
+STATE_ACTIONS = {
+    CalculationStates.waiting_rubles_1.state: scenario1_rubles,
+    CalculationStates.waiting_rate_1.state: scenario1_rate,
+    CalculationStates.waiting_baht_2.state: scenario2_baht,
+    CalculationStates.waiting_rate_2.state: scenario2_rate,
+    CalculationStates.waiting_rubles_3.state: scenario3_rubles,
+    CalculationStates.waiting_profit_3.state: scenario3_profit,
+    CalculationStates.waiting_baht_4.state: scenario4_baht,
+    CalculationStates.waiting_profit_4.state: scenario4_profit,
+    CalculationStates.recalc_waiting_value.state: process_recalculation,
+}
+
+# Фильтры находят действие и передают его аргументом action: по его имени
+# HandlerMetricsMiddleware подписывает время обработки
+def text_action(message: types.Message):
+    action = TEXT_ACTIONS.get(message.text)
+    return {'action': action} if action else False
+
+def state_action(message: types.Message, raw_state: Optional[str] = None):
+    action = STATE_ACTIONS.get(raw_state)
+    return {'action': action} if action else False
+
+async def on_button(message: types.Message, state: FSMContext, app, action):
+    """Кнопки клавиатуры: одна проверка по словарю вместо фильтра на каждую"""
+    await action(message, state, app)
+
+async def on_state_input(message: types.Message, state: FSMContext, app, action):
+    """Ввод значений: обработчик выбирается по текущему состоянию
+
+    Команды сюда не попадают: /bulk, /quote и подписки работают и посреди
+    сценария, а роутер handlers подключен первым.
+    """
+    await action(message, state, app)
+
+async def on_recalc_button(callback: types.CallbackQuery, callback_data: templates.RecalcCallback,
+                           state: FSMContext, app):
+    """Инлайн-кнопка перерасчета"""
+    await callback.answer()
+    # Старые сообщения приходят как InaccessibleMessage - ответить на них нельзя
+    if isinstance(callback.message, types.Message):
+        await start_recalculation(callback.message, callback.from_user.id, callback_data.field, state,
+                                  app)
+
+async def on_menu_button(callback: types.CallbackQuery, state: FSMContext, app):
+    """Инлайн-кнопка возврата в главное меню"""
+    await callback.answer()
+    if isinstance(callback.message, types.Message):
+        await back_to_menu(callback.message, state, app)
+
+async def on_rates_unavailable(event: types.ErrorEvent):
+    """Курсов нет ни в таблице, ни в запасе - отвечаем вместо расчета по неверным курсам
+
+    Ошибки обработчиков всех роутеров доходят сюда через диспетчер.
+    """
+    logger.error(f"Курсы недоступны: {event.exception}")
+    text = "❌ Курсы временно недоступны, попробуйте позже"
+    update = event.update
+    if update.message is not None:
+        await update.message.answer(text)
+    elif update.callback_query is not None:
+        await update.callback_query.answer(text, show_alert=True)
+    elif update.inline_query is not None:
+        await update.inline_query.answer(
+            [], cache_time=0, button=types.InlineQueryResultsButton(text=text, start_parameter="rates")
+        )
+
+def build_router() -> Router:
+    """Роутер сценариев расчета, перерасчета и главного меню"""
+    router = Router(name=__name__)
+    router.message.register(cmd_start, Command("start"))
+    router.message.register(on_button, text_action)
+    router.message.register(on_state_input, state_action, ~F.text.startswith('/'))
+    router.callback_query.register(on_recalc_button, templates.RecalcCallback.filter())
+    router.callback_query.register(on_menu_button, templates.MenuCallback.filter())
+    router.errors.register(on_rates_unavailable, ExceptionTypeFilter(RatesUnavailable))
+    return router
@@ -0,0 +1,104 @@
+"""История курсов: все полученные снимки в одном файле
+
+Файл - заголовок и записи фиксированного размера (время, USDT→THB,
+RUB→USDT, комиссия), только дописывается. Для чтения он отображается в
+память, поэтому годы поминутных снимков не загружаются в RAM, а поиск
+по времени - двоичный, O(log n). Записи упорядочены по времени: запись
+действует до следующей.
+"""
+import fcntl
+import os
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from . import pricing
+
+MAGIC = b'RATEHST1'
+HEADER_SIZE = 16
+RECORD = np.dtype([('at', '<f8'), ('usdt_thb', '<f8'), ('rub_usdt', '<f8'), ('commission', '<f8')])
+
+class RateSnapshot(NamedTuple):
+    """Курсы, действовавшие с момента at (unix-время)"""
+    at: float
+    usdt_thb: float
+    rub_usdt: float
+    commission: float
+
+class RateHistory:
+    """Снимки курсов во времени: дописывание и поиск по моменту"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._records = np.empty(0, RECORD)
+        self._size = HEADER_SIZE
+        with open(path, 'ab+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if f.seek(0, os.SEEK_END) == 0:
+                    f.write(MAGIC.ljust(HEADER_SIZE, b'\0'))
+                f.seek(0)
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{path} не является файлом истории курсов")
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def append(self, at: float, rates):
+        """Дописать снимок; время не может идти назад"""
+        with open(self.path, 'r+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                size = f.seek(0, os.SEEK_END)
+                # Хвост от оборванной записи отбрасываем
+                end = size - (size - HEADER_SIZE) % RECORD.itemsize
+                if end > HEADER_SIZE:
+                    f.seek(end - RECORD.itemsize)
+                    last_at = np.frombuffer(f.read(RECORD.itemsize), RECORD)[0]['at']
+                    at = max(at, float(last_at))
+                record = np.array([(at, rates.usdt_thb, rates.rub_usdt, rates.commission)], RECORD)
+                f.truncate(end)
+                f.seek(end)
+                f.write(record.tobytes())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def records(self) -> np.ndarray:
+        """Все записи; файл отображается в память заново, только если вырос"""
+        size = os.stat(self.path).st_size
+        if size != self._size:
+            count = (size - HEADER_SIZE) // RECORD.itemsize
+            if count:
+                self._records = np.memmap(self.path, RECORD, 'r', offset=HEADER_SIZE, shape=(count,))
+            self._size = size
+        return self._records
+
+    def __len__(self) -> int:
+        return len(self.records())
+
+    def rates_at(self, at: float) -> Optional[RateSnapshot]:
+        """Курсы, действовавшие в момент at; None, если раньше истории"""
+        records = self.records()
+        # bisect по полю отображения не копирует массив, в отличие от searchsorted
+        index = bisect_right(records['at'], at) - 1
+        if index < 0:
+            return None
+        return RateSnapshot(*records[index].item())
+
+    def between(self, start: float, end: float) -> np.ndarray:
+        """Записи за период [start, end] без загрузки остальных"""
+        records = self.records()
+        times = records['at']
+        return records[bisect_left(times, start):bisect_right(times, end)]
+
+    def reprice(self, scenario: int, amount: float, param: float, at: float):
+        """Расчет сценария по курсам, действовавшим в момент at
+
+        Например, для последнего расчета пользователя:
+        reprice(record.scenario, amount, param, record.calculated_at).
+        None, если на тот момент истории еще нет.
+        """
+        rates = self.rates_at(at)
+        if rates is None:
+            return None
+        return pricing.SCENARIOS[scenario](rates, amount, param)
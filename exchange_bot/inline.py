@@ -0,0 +1,130 @@
+"""Инлайн-режим: мгновенный расчет по кэшу курсов
+
+Запрос «@bot 50000 rub 2.6» считает сценарий 1, «1000 thb 2.6» - сценарий 2,
+а профит вместо курса задается знаком «+»: «50000 rub +500» - сценарий 3,
+«1000 thb +50» - сценарий 4. Ответы запоминаются по паре (запрос, версия
+снимка курсов), поэтому частый набор текста не повторяет расчеты.
+Настройки приходят из create_app объектом InlineQuotes (аргумент inline_quotes).
+"""
+import hashlib
+import re
+from collections import OrderedDict
+
+from aiogram import Router, types
+from aiogram.types import InlineQueryResultArticle, InlineQueryResultsButton, InputTextMessageContent
+
+from . import pricing
+from . import templates
+
+QUERY_RE = re.compile(
+    r'^(?P<amount>\d[\d ]*(?:\.\d+)?)\s*'
+    r'(?P<currency>rub|руб\w*|₽|thb|бат\w*|฿)\s*'
+    r'(?P<profit>\+)?\s*(?P<param>\d+(?:\.\d+)?)$'
+)
+
+# (валюта, профит?) → сценарий
+QUERY_SCENARIOS = {
+    ('rub', False): 1,
+    ('thb', False): 2,
+    ('rub', True): 3,
+    ('thb', True): 4,
+}
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.lower().replace(',', '.').split())
+
+def parse_query(query: str):
+    """(сценарий, сумма, параметр) или None"""
+    match = QUERY_RE.match(query)
+    if match is None:
+        return None
+    currency = 'thb' if match['currency'][0] in 'tб฿' else 'rub'
+    scenario = QUERY_SCENARIOS[currency, match['profit'] is not None]
+    return scenario, float(match['amount'].replace(' ', '')), float(match['param'])
+
+# Заголовок результата в списке инлайн-ответов
+QUOTE_TITLES = {
+    1: "{rubles:,.2f} RUB → {thb_client:,.2f} THB",
+    2: "{baht:,.2f} THB → {rubles_client:,.2f} RUB",
+    3: "{rubles:,.2f} RUB → {thb_client:,.2f} THB по {client_rate}",
+    4: "{baht:,.2f} THB ← {rubles_client:,.2f} RUB по {client_rate}",
+}
+QUOTE_TITLES = {scenario: templates.Template(title) for scenario, title in QUOTE_TITLES.items()}
+
+def format_quote(scenario: int, result) -> tuple:
+    """Заголовок и текст сообщения с результатом"""
+    return QUOTE_TITLES[scenario].render(result), templates.quote_text(scenario, result)
+
+def build_results(query: str, rates) -> list:
+    """Результаты инлайн-запроса без обращения к памяти"""
+    parsed = parse_query(query)
+    if parsed is None:
+        return []
+    scenario, amount, param = parsed
+    try:
+        result = pricing.SCENARIOS[scenario](rates, amount, param)
+    except ZeroDivisionError:
+        return []
+    title, text = format_quote(scenario, result)
+    return [InlineQueryResultArticle(
+        id=hashlib.md5(query.encode()).hexdigest(),
+        title=title,
+        description=f"Сценарий {scenario}",
+        input_message_content=InputTextMessageContent(message_text=text, parse_mode="HTML")
+    )]
+
+class InlineQuotes:
+    """Ответы на инлайн-запросы с запоминанием по (запрос, версия курсов, устаревшие ли курсы)
+
+    memo_size - сколько ответов хранить в памяти, cache_time - сколько
+    секунд Telegram может кэшировать ответ на одинаковый запрос.
+    """
+
+    def __init__(self, memo_size: int = 1024, cache_time: int = 30):
+        self.memo_size = memo_size
+        self.cache_time = cache_time
+        self._memo: "OrderedDict[tuple, list]" = OrderedDict()
+
+    def results(self, query: str, rates, version: int) -> list:
+        """Результаты запроса
+
+        Предупреждение о курсах с их возрастом меняется каждую секунду,
+        поэтому добавляется уже после поиска в памяти.
+        """
+        key = (query, version, rates.stale)
+        results = self._memo.get(key)
+        if results is None:
+            results = build_results(query, rates)
+            self._memo[key] = results
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(key)
+        notice = templates.rates_notice(rates)
+        if notice:
+            results = [with_notice(result, notice) for result in results]
+        return results
+
+def with_notice(result: InlineQueryResultArticle, notice: str) -> InlineQueryResultArticle:
+    """Копия результата с предупреждением о курсах в конце сообщения"""
+    content = result.input_message_content
+    return result.model_copy(update={
+        'input_message_content': content.model_copy(update={'message_text': content.message_text + notice})
+    })
+
+async def inline_quote(inline_query: types.InlineQuery, rate_cache, inline_quotes: InlineQuotes):
+    """Расчет прямо в строке ввода: @bot 50000 rub 2.6"""
+    query = normalize_query(inline_query.query)
+    results = inline_quotes.results(query, rate_cache.get(), rate_cache.version)
+    # Не разобрали запрос - подсказываем формат кнопкой над результатами
+    button = None
+    if not results:
+        button = InlineQueryResultsButton(text="Формат: 50000 rub 2.6 или 1000 thb +50",
+                                          start_parameter="inline")
+    await inline_query.answer(results, cache_time=inline_quotes.cache_time, button=button)
+
+def build_router() -> Router:
+    """Роутер инлайн-режима"""
+    router = Router(name=__name__)
+    router.inline_query.register(inline_quote)
+    return router
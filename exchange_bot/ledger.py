@@ -0,0 +1,150 @@
+"""Журнал сделок: локальная очередь и пакетная запись в Google Sheets
+
+Завершенный расчет сразу записывается в очередь SQLite - это доли
+миллисекунды в event loop, без обращения к сети. Фоновая задача
+забирает накопившиеся строки и дописывает их в лист одним вызовом
+append_rows, как только набралось batch_size строк или прошло
+flush_interval секунд. Строки удаляются из очереди только после
+успешной записи, поэтому после сбоя или перезапуска они будут записаны
+повторно (не менее одного раза); у каждой строки свой номер для сверки.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from . import metrics
+from .storage import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# Колонки листа сделок: номер, время, пользователь, сценарий и поля результатов
+RESULT_FIELDS = ['rubles', 'baht', 'client_rate', 'desired_profit', 'thb_client',
+                 'rubles_client', 'profit', 'thb_real', 'rubles_real', 'real_rate']
+LEDGER_COLUMNS = ['id', 'time', 'user_id', 'scenario'] + RESULT_FIELDS
+
+class DealQueue:
+    """Очередь сделок, ожидающих записи в таблицу"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = SQLiteDatabase(path, (
+            "CREATE TABLE IF NOT EXISTS deal_queue ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, "
+            "user_id INTEGER NOT NULL, scenario INTEGER NOT NULL, result TEXT NOT NULL)",
+        ))
+
+    def push(self, user_id: int, scenario: int, result: Dict[str, Any]):
+        self._db.execute(
+            "INSERT INTO deal_queue (created_at, user_id, scenario, result) VALUES (?, ?, ?, ?)",
+            (time.time(), user_id, scenario, json.dumps(result))
+        )
+
+    def peek(self, limit: int) -> List[tuple]:
+        """Самые старые строки: (id, created_at, user_id, scenario, result)"""
+        return self._db.execute(
+            "SELECT id, created_at, user_id, scenario, result FROM deal_queue "
+            "ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+
+    def ack(self, last_id: int):
+        """Удалить записанные строки до last_id включительно"""
+        self._db.execute("DELETE FROM deal_queue WHERE id <= ?", (last_id,))
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM deal_queue").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+def ledger_row(deal_id: int, created_at: float, user_id: int, scenario: int, result: str) -> list:
+    """Строка листа сделок"""
+    values = json.loads(result)
+    moment = datetime.fromtimestamp(created_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return [deal_id, moment, user_id, scenario] + [values.get(name, '') for name in RESULT_FIELDS]
+
+class DealLedger:
+    """Фоновая пакетная выгрузка очереди сделок
+
+    write_rows(rows) - синхронная запись строк в таблицу, выполняется
+    в executor. Из нескольких процессов выгружает один: остальные
+    пропускают выгрузку, пока файл очереди заблокирован.
+    """
+
+    def __init__(self, queue: DealQueue, write_rows: Callable[[list], None], executor,
+                 batch_size: int = 100, flush_interval: float = 30, timeout: float = 30):
+        self.queue = queue
+        self.write_rows = write_rows
+        self.executor = executor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self._pending = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+
+    def record(self, user_id: int, scenario: int, result: Dict[str, Any]):
+        """Поставить сделку в очередь; в таблицу она попадет позже"""
+        try:
+            self.queue.push(user_id, scenario, result)
+        except Exception as e:
+            logger.error(f"Не удалось записать сделку в очередь: {e}")
+            return
+        self._pending += 1
+        if self._pending >= self.batch_size and self._wake is not None:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Выгрузить очередь пакетами; вернуть число записанных строк"""
+        written = 0
+        async with self._lock:
+            with open(f"{self.queue.path}.lock", 'a') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Выгружает другой процесс
+                    return 0
+                try:
+                    self._pending = 0
+                    loop = asyncio.get_running_loop()
+                    while True:
+                        batch = self.queue.peek(self.batch_size)
+                        if not batch:
+                            break
+                        rows = [ledger_row(*deal) for deal in batch]
+                        await asyncio.wait_for(
+                            loop.run_in_executor(self.executor, self.write_rows, rows),
+                            timeout=self.timeout
+                        )
+                        self.queue.ack(batch[-1][0])
+                        metrics.DEALS_WRITTEN.inc(len(rows))
+                        written += len(rows)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return written
+
+    async def try_flush(self):
+        """Выгрузка с логированием ошибок; недописанное останется в очереди"""
+        try:
+            await self.flush()
+        except asyncio.TimeoutError:
+            logger.error("Таймаут записи сделок в таблицу")
+        except Exception as e:
+            logger.error(f"Ошибка записи сделок в таблицу: {e}")
+
+    async def run(self):
+        """Выгрузка по размеру пакета или раз в flush_interval секунд"""
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.try_flush()
+
+    def close(self):
+        self.queue.close()
@@ -0,0 +1,173 @@
+"""Метрики в формате Prometheus
+
+Гистограммы задержек обработчиков, запросов к Google Sheets и Telegram API,
+операций FSM-хранилища и отставания event loop, счетчики обновлений,
+ошибок и обращений к кэшу курсов, время запуска. Отдаются по HTTP на /metrics.
+При нескольких процессах задайте PROMETHEUS_MULTIPROC_DIR - тогда любой
+процесс отдает сумму по всем.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.types import TelegramObject, Update
+from aiohttp import web
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest)
+
+logger = logging.getLogger(__name__)
+
+HANDLER_LATENCY = Histogram(
+    'bot_handler_seconds', 'Время работы обработчика', ['handler', 'state']
+)
+UPDATE_LATENCY = Histogram(
+    'bot_update_seconds', 'Полное время обработки обновления', ['type']
+)
+UPDATES = Counter('bot_updates_total', 'Полученные обновления', ['type'])
+UPDATE_ERRORS = Counter('bot_update_errors_total', 'Обновления, завершившиеся ошибкой', ['type'])
+SHEETS_LATENCY = Histogram('bot_sheets_fetch_seconds', 'Время чтения курсов из Google Sheets')
+SHEETS_ERRORS = Counter('bot_sheets_fetch_errors_total', 'Неудачные чтения курсов')
+RATE_SOURCE_CIRCUIT_OPEN = Gauge(
+    'bot_rate_source_circuit_open', '1 - запросы к таблице курсов приостановлены после ошибок'
+)
+RATE_CACHE_READS = Counter(
+    'bot_rate_cache_reads_total', 'Чтения кэша курсов: fresh - попадание, stale/cold - промах',
+    ['result']
+)
+STORAGE_LATENCY = Histogram(
+    'bot_fsm_storage_seconds', 'Время операций FSM-хранилища', ['operation'],
+    buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1)
+)
+TELEGRAM_LATENCY = Histogram('bot_telegram_api_seconds', 'Время запросов к Telegram API', ['method'])
+TELEGRAM_ERRORS = Counter('bot_telegram_api_errors_total', 'Ошибки запросов к Telegram API', ['method'])
+THROTTLED_UPDATES = Counter('bot_throttled_updates_total', 'Обновления, отклоненные ограничением частоты')
+DEALS_WRITTEN = Counter('bot_deals_written_total', 'Сделки, записанные в таблицу')
+STARTUP_SECONDS = Gauge(
+    'bot_startup_seconds', 'Время запуска: setup - от запуска процесса до готового приложения, warm_up - прогрев курсов, '
+    'total - от запуска процесса до приема обновлений', ['phase']
+)
+EVENT_LOOP_LAG = Histogram(
+    'bot_event_loop_lag_seconds', 'Отставание event loop',
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+# Заранее привязанные метки для горячего пути
+RATE_CACHE_FRESH = RATE_CACHE_READS.labels('fresh')
+RATE_CACHE_STALE = RATE_CACHE_READS.labels('stale')
+RATE_CACHE_COLD = RATE_CACHE_READS.labels('cold')
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Счетчики и полное время обработки обновлений (outer middleware на update)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        UPDATES.labels(update_type).inc()
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            UPDATE_ERRORS.labels(update_type).inc()
+            raise
+        finally:
+            UPDATE_LATENCY.labels(update_type).observe(time.perf_counter() - start)
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время обработчика по имени и FSM-состоянию (inner middleware)
+
+    Если фильтр выбрал действие из таблицы (аргумент action), метка - имя
+    действия, а не общего обработчика-диспетчера.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get('handler')
+        name = getattr(handler_object.callback, '__name__', 'unknown') if handler_object else 'unknown'
+        name = getattr(data.get('action'), '__name__', name)
+        state = data.get('raw_state') or 'none'
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_LATENCY.labels(name, state).observe(time.perf_counter() - start)
+
+class TelegramApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время запросов к Telegram API по методам"""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            TELEGRAM_ERRORS.labels(name).inc()
+            raise
+        finally:
+            TELEGRAM_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+class InstrumentedStorage(BaseStorage):
+    """FSM-хранилище с замером времени операций"""
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        with STORAGE_LATENCY.labels('set_state').time():
+            await self.storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with STORAGE_LATENCY.labels('get_state').time():
+            return await self.storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        with STORAGE_LATENCY.labels('set_data').time():
+            await self.storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        with STORAGE_LATENCY.labels('get_data').time():
+            return await self.storage.get_data(key)
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Замер отставания event loop: насколько позже срабатывает sleep"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+def _registry():
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(_registry()), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """HTTP-сервер с единственным маршрутом /metrics"""
+    app = web.Application()
+    app.router.add_get('/metrics', _metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    # reuse_port: в режиме нескольких процессов порт слушает каждый из них
+    await web.TCPSite(runner, host, port, reuse_port=True).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,287 @@
+"""Расчеты обмена RUB → USDT → THB
+
+Функции не обращаются к сети: снимок курсов передается явно. Для каждого
+сценария есть скалярная версия и пакетная на NumPy, которая считает сразу
+массив сумм или курсов.
+
+Скалярные версии считают в Decimal: курсы из таблицы и введенные числа
+берутся в десятичной записи, множители направлений (баты за рубль и
+рубли за бат с учетом комиссии) считаются один раз на снимок курсов, а
+суммы округляются до копейки или сатанга по правилу PRICING_ROUNDING.
+Результаты - обычные float уже округленных значений. Пакетные версии
+дают те же значения, что и скалярные.
+"""
+from decimal import (ROUND_CEILING, ROUND_DOWN, ROUND_FLOOR, ROUND_HALF_DOWN, ROUND_HALF_EVEN,
+                     ROUND_HALF_UP, ROUND_UP, Context, Decimal)
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from . import config
+
+# Контекст создается один раз; 28 значащих цифр с запасом покрывают любые суммы
+CONTEXT = Context(prec=28, rounding=config.PRICING_ROUNDING)
+MONEY = Decimal('0.01')
+RATE = Decimal('0.0001')
+ONE = Decimal(1)
+
+class Coefficients(NamedTuple):
+    """Множители направлений для одного снимка курсов"""
+    thb_per_usdt: Decimal
+    thb_per_rub: Decimal
+    rub_per_thb: Decimal
+
+def to_decimal(value) -> Decimal:
+    """Число в Decimal по его десятичной записи (31.89, а не 31.8899999...)"""
+    number = value if isinstance(value, Decimal) else Decimal(repr(value))
+    if not number.is_finite():
+        raise ValueError(f"Не число: {value}")
+    return number
+
+@lru_cache(maxsize=64)
+def _coefficients(usdt_thb: float, rub_usdt: float, commission: float) -> Coefficients:
+    # USDT → THB с учетом комиссии
+    thb_per_usdt = CONTEXT.multiply(to_decimal(usdt_thb), CONTEXT.subtract(ONE, to_decimal(commission)))
+    rub_usdt = to_decimal(rub_usdt)
+    return Coefficients(
+        thb_per_usdt=thb_per_usdt,
+        thb_per_rub=CONTEXT.divide(thb_per_usdt, rub_usdt),
+        rub_per_thb=CONTEXT.divide(rub_usdt, thb_per_usdt),
+    )
+
+def coefficients(rates) -> Coefficients:
+    """Множители снимка; считаются один раз на набор курсов"""
+    return _coefficients(rates.usdt_thb, rates.rub_usdt, rates.commission)
+
+def _money(value: Decimal) -> float:
+    return float(value.quantize(MONEY, context=CONTEXT))
+
+def _rate(value: Decimal) -> float:
+    return float(value.quantize(RATE, context=CONTEXT))
+
+def _quotient(numerator: Decimal, denominator: Decimal) -> Decimal:
+    if not denominator:
+        raise ZeroDivisionError("Деление на ноль")
+    return CONTEXT.divide(numerator, denominator)
+
+def rubles_to_baht(rates, rubles: float, client_rate: float):
+    """Сценарий 1: рубли + курс → баты + профит"""
+    factors = coefficients(rates)
+    # Рубли → USDT → THB (с комиссией)
+    thb_real = CONTEXT.multiply(to_decimal(rubles), factors.thb_per_rub)
+
+    # Баты для клиента
+    thb_client = _quotient(to_decimal(rubles), to_decimal(client_rate))
+
+    return {
+        'rubles': rubles,
+        'client_rate': client_rate,
+        'thb_client': _money(thb_client),
+        'profit': _money(CONTEXT.subtract(thb_real, thb_client)),
+        # rubles / thb_real не зависит от суммы
+        'real_rate': _rate(factors.rub_per_thb) if thb_real > 0 else 0
+    }
+
+def baht_to_rubles(rates, baht: float, client_rate: float):
+    """Сценарий 2: баты + курс → рубли + профит"""
+    factors = coefficients(rates)
+    client_rate_d = to_decimal(client_rate)
+    # Рубли для клиента
+    rubles_client = CONTEXT.multiply(to_decimal(baht), client_rate_d)
+
+    # THB → USDT → RUB (реальный курс с комиссией)
+    rubles_real = CONTEXT.multiply(to_decimal(baht), factors.rub_per_thb)
+
+    # Профит в батах
+    profit_baht = _quotient(CONTEXT.subtract(rubles_client, rubles_real), client_rate_d)
+
+    return {
+        'baht': baht,
+        'client_rate': client_rate,
+        'rubles_client': _money(rubles_client),
+        'profit': _money(profit_baht),
+        'rubles_real': _money(rubles_real)
+    }
+
+def rubles_profit_to_baht(rates, rubles: float, desired_profit: float):
+    """Сценарий 3: рубли + профит → баты + курс"""
+    factors = coefficients(rates)
+    rubles_d = to_decimal(rubles)
+    # Рубли → USDT → THB (реальная сумма)
+    thb_real = CONTEXT.multiply(rubles_d, factors.thb_per_rub)
+
+    # Баты для клиента
+    thb_client = CONTEXT.subtract(thb_real, to_decimal(desired_profit))
+
+    # Курс для клиента
+    client_rate = _rate(CONTEXT.divide(rubles_d, thb_client)) if thb_client > 0 else 0
+
+    return {
+        'rubles': rubles,
+        'desired_profit': desired_profit,
+        'thb_client': _money(thb_client),
+        'client_rate': client_rate,
+        'thb_real': _money(thb_real)
+    }
+
+def baht_profit_to_rubles(rates, baht: float, desired_profit: float):
+    """Сценарий 4: баты + профит → рубли + курс"""
+    factors = coefficients(rates)
+    baht_d = to_decimal(baht)
+    # THB → USDT → RUB (реальная сумма с учетом комиссии)
+    rubles_real = CONTEXT.multiply(baht_d, factors.rub_per_thb)
+
+    # Рубли от клиента: профит в батах по реальному курсу
+    rubles_client = rubles_real
+    if baht_d > 0:
+        rubles_client = CONTEXT.add(
+            rubles_real, CONTEXT.multiply(to_decimal(desired_profit), factors.rub_per_thb)
+        )
+
+    # Курс для клиента
+    client_rate = _rate(CONTEXT.divide(rubles_client, baht_d)) if baht_d > 0 else 0
+
+    return {
+        'baht': baht,
+        'desired_profit': desired_profit,
+        'rubles_client': _money(rubles_client),
+        'client_rate': client_rate,
+        'rubles_real': _money(rubles_real)
+    }
+
+# Пакетные версии: аргументы - числа или массивы, приводятся к общей форме.
+# Считают во float с теми же множителями снимка и округляют по правилу
+# PRICING_ROUNDING. Float отличается от Decimal на единицы 1e-16 доли,
+# поэтому результат расходится со скалярной версией только у самой границы
+# округления - такие строки пересчитываются скалярной версией. Строки, где
+# скалярная версия делит на ноль, получают NaN
+
+# Правила, у которых граница округления - половина последнего знака
+HALF_ROUNDINGS = {ROUND_HALF_UP, ROUND_HALF_DOWN, ROUND_HALF_EVEN}
+# Правила, которые можно повторить во float; для остальных точно считается каждая строка
+FLOAT_ROUNDINGS = {
+    ROUND_HALF_UP: np.round,
+    ROUND_HALF_DOWN: np.round,
+    ROUND_HALF_EVEN: np.round,
+    ROUND_DOWN: np.trunc,
+    ROUND_UP: lambda values: np.copysign(np.ceil(np.abs(values)), values),
+    ROUND_CEILING: np.ceil,
+    ROUND_FLOOR: np.floor,
+}
+# Допуск до границы: с запасом больше накопленной ошибки float
+ABSOLUTE_TOLERANCE = 1e-6
+RELATIVE_TOLERANCE = 1e-11
+
+def _divide(numerator, denominator):
+    # Деление с нулем там, где знаменатель не положителен (как в скалярных версиях)
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    out = np.zeros(numerator.shape)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+def _round(values, places: int, near: np.ndarray) -> np.ndarray:
+    """Округление по правилу CONTEXT; строки у границы отмечаются в near"""
+    scaled = np.asarray(values, dtype=float) * 10.0 ** places
+    round_float = FLOAT_ROUNDINGS.get(CONTEXT.rounding)
+    if round_float is None:
+        near[...] = True
+        return scaled
+    with np.errstate(invalid='ignore'):
+        offset = 0.5 if CONTEXT.rounding in HALF_ROUNDINGS else 0.0
+        boundary = np.round(scaled - offset) + offset
+        tolerance = np.maximum(ABSOLUTE_TOLERANCE, np.abs(scaled) * RELATIVE_TOLERANCE)
+        # Ноль - граница знака: от него зависят и округление, и ветки сценариев
+        near |= ~np.isfinite(scaled) | (np.abs(scaled - boundary) < tolerance) | (np.abs(scaled) < tolerance)
+    return round_float(scaled) / 10.0 ** places
+
+def _exact(result: dict, scenario, rates, near: np.ndarray) -> dict:
+    """Пересчет отмеченных строк скалярной версией"""
+    first, second = (result[name] for name in list(result)[:2])
+    for index in zip(*np.nonzero(near)):
+        try:
+            row = scenario(rates, float(first[index]), float(second[index]))
+        except ZeroDivisionError:
+            row = {name: np.nan for name in list(result)[2:]}
+        for name, value in row.items():
+            result[name][index] = value
+    return result
+
+def _inputs(first, second):
+    first, second = np.broadcast_arrays(np.asarray(first, dtype=float), np.asarray(second, dtype=float))
+    # Копии: broadcast_arrays отдает представления только для чтения
+    return first.copy(), second.copy(), np.zeros(first.shape, dtype=bool)
+
+def rubles_to_baht_batch(rates, rubles, client_rate):
+    """Сценарий 1 для массивов сумм и курсов"""
+    factors = coefficients(rates)
+    rubles, client_rate, near = _inputs(rubles, client_rate)
+    thb_real = rubles * float(factors.thb_per_rub)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        thb_client = rubles / client_rate
+    return _exact({
+        'rubles': rubles,
+        'client_rate': client_rate,
+        'thb_client': _round(thb_client, 2, near),
+        'profit': _round(thb_real - thb_client, 2, near),
+        # rubles / thb_real не зависит от суммы
+        'real_rate': np.where(rubles > 0, _rate(factors.rub_per_thb), 0.0)
+    }, rubles_to_baht, rates, near)
+
+def baht_to_rubles_batch(rates, baht, client_rate):
+    """Сценарий 2 для массивов сумм и курсов"""
+    baht, client_rate, near = _inputs(baht, client_rate)
+    rubles_client = baht * client_rate
+    rubles_real = baht * float(coefficients(rates).rub_per_thb)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit = (rubles_client - rubles_real) / client_rate
+    return _exact({
+        'baht': baht,
+        'client_rate': client_rate,
+        'rubles_client': _round(rubles_client, 2, near),
+        'profit': _round(profit, 2, near),
+        'rubles_real': _round(rubles_real, 2, near)
+    }, baht_to_rubles, rates, near)
+
+def rubles_profit_to_baht_batch(rates, rubles, desired_profit):
+    """Сценарий 3 для массивов сумм и профитов"""
+    rubles, desired_profit, near = _inputs(rubles, desired_profit)
+    thb_real = rubles * float(coefficients(rates).thb_per_rub)
+    thb_client = thb_real - desired_profit
+    return _exact({
+        'rubles': rubles,
+        'desired_profit': desired_profit,
+        'thb_client': _round(thb_client, 2, near),
+        'client_rate': _round(_divide(rubles, thb_client), 4, near),
+        'thb_real': _round(thb_real, 2, near)
+    }, rubles_profit_to_baht, rates, near)
+
+def baht_profit_to_rubles_batch(rates, baht, desired_profit):
+    """Сценарий 4 для массивов сумм и профитов"""
+    baht, desired_profit, near = _inputs(baht, desired_profit)
+    rubles_per_baht = float(coefficients(rates).rub_per_thb)
+    rubles_real = baht * rubles_per_baht
+    # Профит в батах переводим в рубли по реальному курсу (при baht > 0)
+    rubles_client = rubles_real + np.where(baht > 0, desired_profit * rubles_per_baht, 0)
+    return _exact({
+        'baht': baht,
+        'desired_profit': desired_profit,
+        'rubles_client': _round(rubles_client, 2, near),
+        'client_rate': _round(_divide(rubles_client, baht), 4, near),
+        'rubles_real': _round(rubles_real, 2, near)
+    }, baht_profit_to_rubles, rates, near)
+
+# Сценарий → функция расчета
+SCENARIOS = {
+    1: rubles_to_baht,
+    2: baht_to_rubles,
+    3: rubles_profit_to_baht,
+    4: baht_profit_to_rubles,
+}
+
+BATCH_SCENARIOS = {
+    1: rubles_to_baht_batch,
+    2: baht_to_rubles_batch,
+    3: rubles_profit_to_baht_batch,
+    4: baht_profit_to_rubles_batch,
+}
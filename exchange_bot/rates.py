@@ -0,0 +1,508 @@
+"""Курсы из Google Sheets: подключение, разбор таблицы и кэш снимка
+
+gspread и oauth2client импортируются при первом подключении к таблице,
+а не при запуске: без учетных данных они не загружаются вовсе.
+
+Если таблица недоступна, запросы к ней после нескольких ошибок подряд
+приостанавливаются (CircuitBreaker), а кэш отдает последний известный
+снимок или снимок из резервного файла - смотря какой новее - с пометкой
+stale. Тестовые значения используются, только когда таблица не настроена.
+"""
+import asyncio
+import csv
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import Optional
+
+from . import metrics
+from .breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_SCOPE = ['https://spreadsheets.google.com/feeds',
+                'https://www.googleapis.com/auth/drive']
+
+class SheetsClient:
+    """Долгоживущее подключение к Google Sheets
+
+    Учетные данные разбираются один раз, авторизованный клиент и лист
+    переиспользуются между запросами. Сессия gspread держит keep-alive
+    соединение и сама обновляет OAuth-токен, когда срок его жизни подходит
+    к концу, поэтому повторная авторизация нужна только после ошибки.
+
+    timeout - таймаут HTTP-запросов gspread в секундах. Без него зависший
+    запрос навсегда занимает поток пула: asyncio.wait_for прекращает только
+    ожидание, а не сам вызов.
+    """
+
+    def __init__(self, credentials_json, spreadsheet_id, timeout: Optional[float] = None):
+        self.spreadsheet_id = spreadsheet_id
+        self.timeout = timeout
+        self._creds_dict = json.loads(credentials_json) if credentials_json else None
+        self._client = None
+        self._spreadsheet = None
+        self._sheet = None
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._creds_dict and self.spreadsheet_id)
+
+    def _check_configured(self) -> bool:
+        if not self._creds_dict:
+            logger.warning("Google Credentials не найдены, используем тестовые значения")
+            return False
+        if not self.spreadsheet_id:
+            logger.warning("SPREADSHEET_ID не указан")
+            return False
+        return True
+
+    def _open(self):
+        # Вызывается под self._lock
+        if self._spreadsheet is None:
+            if self._client is None:
+                # Тяжелые библиотеки грузятся только при первом подключении
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+
+                credentials = ServiceAccountCredentials.from_json_keyfile_dict(
+                    self._creds_dict, GOOGLE_SCOPE
+                )
+                self._client = gspread.authorize(credentials)
+                if self.timeout:
+                    self._client.set_timeout(self.timeout)
+            self._spreadsheet = self._client.open_by_key(self.spreadsheet_id)
+        return self._spreadsheet
+
+    def worksheet(self):
+        """Первый лист таблицы или None, если таблица не настроена"""
+        if self._sheet is not None:
+            return self._sheet
+        if not self._check_configured():
+            return None
+
+        # gspread вызывается из пула потоков - подключаемся один раз
+        with self._lock:
+            if self._sheet is None:
+                self._sheet = self._open().sheet1
+        return self._sheet
+
+    def named_worksheet(self, title: str, header: list):
+        """Лист по названию; если его нет - создается с заголовком"""
+        sheet = self._worksheets.get(title)
+        if sheet is not None:
+            return sheet
+        if not self._check_configured():
+            return None
+
+        with self._lock:
+            if title not in self._worksheets:
+                from gspread import WorksheetNotFound
+
+                spreadsheet = self._open()
+                try:
+                    sheet = spreadsheet.worksheet(title)
+                except WorksheetNotFound:
+                    sheet = spreadsheet.add_worksheet(title, rows=1, cols=len(header))
+                    sheet.append_row(header)
+                self._worksheets[title] = sheet
+        return self._worksheets[title]
+
+    def append_rows(self, title: str, header: list, rows: list):
+        """Дописать строки в лист title (вызывается из пула потоков)"""
+        sheet = self.named_worksheet(title, header)
+        if sheet is None:
+            raise RuntimeError("Google Sheets не настроен")
+        try:
+            sheet.append_rows(rows, value_input_option='USER_ENTERED')
+        except Exception:
+            self.reset()
+            raise
+
+    def reset(self):
+        """Сброс подключения: следующий запрос авторизуется заново"""
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._sheet = None
+            self._worksheets = {}
+
+@dataclass(frozen=True)
+class ExchangeRates:
+    """Снимок курсов из таблицы"""
+    usdt_thb: float
+    rub_usdt: float
+    commission: float = 0.0025  # 0.25%
+    # Дополнительные пары: подпись из столбца A → значение из столбца B
+    pairs: dict = field(default_factory=dict)
+    # Комиссии дополнительных пар из столбца C: подпись → доля
+    fees: dict = field(default_factory=dict)
+    # Откуда снимок (sheets, file или default) и когда получен; в сравнении не участвуют
+    source: str = field(default='sheets', compare=False)
+    fetched_at: float = field(default=0.0, compare=False)
+    # Таблица недоступна, отдается последний известный снимок
+    stale: bool = field(default=False, compare=False)
+
+# Тестовые значения, если таблица не настроена
+DEFAULT_RATES = ExchangeRates(usdt_thb=31.89, rub_usdt=79.50, source='default')
+
+class RatesUnavailable(Exception):
+    """Курсов нет ни в таблице, ни в кэше, ни в резервном файле"""
+
+def parse_number(value: str) -> float:
+    """Число из ячейки таблицы: допускает запятую и знак процента"""
+    value = value.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    if value.endswith('%'):
+        return float(value[:-1]) / 100
+    return float(value)
+
+def validate_rates(rates: ExchangeRates) -> ExchangeRates:
+    """Проверка снимка: ошибка в таблице не должна попасть в расчеты
+
+    Нулевой курс ломает деление, а комиссия, введенная в процентах без
+    знака % (25 вместо 0.25%), дает отрицательный профит или, для пары,
+    отрицательный курс ребра графа маршрутов.
+    """
+    # Сравнение отсекает и NaN, и бесконечность
+    if not (0 < rates.usdt_thb < math.inf and 0 < rates.rub_usdt < math.inf):
+        raise ValueError(f"курсы должны быть больше нуля: {rates.usdt_thb}, {rates.rub_usdt}")
+    if not 0 <= rates.commission < 1:
+        raise ValueError(f"комиссия должна быть от 0 до 1 (0.25% - это 0.0025): {rates.commission}")
+    for label, fee in rates.fees.items():
+        if not 0 <= fee < 1:
+            raise ValueError(f"комиссия пары {label} должна быть от 0 до 1 (0.25% - это 0.0025): {fee}")
+    return rates
+
+def parse_rates(rows) -> ExchangeRates:
+    """Разбор диапазона курсов
+
+    Строка 1 - курс USDT→THB, строка 2 - курс RUB→USDT, строка 3 - комиссия
+    (если пусто - 0.25%), остальные строки - дополнительные пары: подпись,
+    значение и необязательная комиссия в столбце C. Пара «X/Y» означает
+    1 X = значение Y и участвует в маршрутах /quote.
+    """
+    cells = [(row + ['', '', ''])[:3] for row in rows]
+    cells += [['', '', '']] * (3 - len(cells))
+
+    commission = cells[2][1].strip()
+    pairs = {}
+    fees = {}
+    for label, value, fee in cells[3:]:
+        if label.strip() and value.strip():
+            pairs[label.strip()] = parse_number(value)
+            if fee.strip():
+                fees[label.strip()] = parse_number(fee)
+
+    return validate_rates(ExchangeRates(
+        usdt_thb=parse_number(cells[0][1]),
+        rub_usdt=parse_number(cells[1][1]),
+        commission=parse_number(commission) if commission else DEFAULT_RATES.commission,
+        pairs=pairs,
+        fees=fees
+    ))
+
+class SharedRateSnapshot:
+    """Снимок курсов в файле, общий для процессов на одной машине
+
+    Таблицу читает только один процесс: остальные ждут его на файловой
+    блокировке и берут снимок из файла, пока тот моложе ttl.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - payload['fetched_at'] > self.ttl:
+            return None
+        return ExchangeRates(**payload['rates'])
+
+    def _save(self, rates: ExchangeRates):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': time.time(), 'rates': asdict(rates)}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def load_or_fetch(self, fetch) -> ExchangeRates:
+        """Свежий снимок из файла или из таблицы через fetch()"""
+        with open(f"{self.path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                rates = self._load()
+                if rates is None:
+                    rates = fetch()
+                    # Другим процессам отдаются только курсы из таблицы
+                    if rates.source == 'sheets':
+                        self._save(rates)
+                return rates
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+class FileRateSource:
+    """Резервные курсы из локального файла
+
+    JSON - объект с полями usdt_thb, rub_usdt и необязательными commission,
+    pairs и fees; CSV - строки в формате диапазона курсов таблицы. Файл
+    перечитывается только после изменения; время снимка - время изменения.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._rates = None
+
+    def _parse(self, mtime: float) -> ExchangeRates:
+        if self.path.endswith('.json'):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            rates = ExchangeRates(
+                usdt_thb=float(data['usdt_thb']),
+                rub_usdt=float(data['rub_usdt']),
+                commission=float(data.get('commission', DEFAULT_RATES.commission)),
+                pairs={label: float(value) for label, value in data.get('pairs', {}).items()},
+                fees={label: float(value) for label, value in data.get('fees', {}).items()}
+            )
+        else:
+            with open(self.path, encoding='utf-8', newline='') as f:
+                rates = parse_rates(list(csv.reader(f)))
+        return replace(validate_rates(rates), source='file', fetched_at=mtime)
+
+    def load(self) -> Optional[ExchangeRates]:
+        """Снимок из файла или None, если файла нет или он некорректен"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime != self._mtime:
+                self._rates = self._parse(mtime)
+                self._mtime = mtime
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.error(f"Ошибка чтения резервных курсов {self.path}: {e}")
+            return None
+        return self._rates
+
+class RateSource:
+    """Чтение курсов из таблицы в пуле потоков с таймаутом
+
+    history - история курсов (RateHistory), shared - общий снимок для
+    нескольких процессов (SharedRateSnapshot), secondary - резервный
+    источник (FileRateSource); все необязательны. Пока цепь breaker
+    разомкнута, fetch сразу завершается ошибкой.
+    """
+
+    def __init__(self, sheets_client: SheetsClient, rates_range: str, executor, *,
+                 max_concurrency: int = 1, timeout: float = 10, history=None, shared=None,
+                 secondary: Optional[FileRateSource] = None, breaker: Optional[CircuitBreaker] = None):
+        self.sheets_client = sheets_client
+        self.rates_range = rates_range
+        self.executor = executor
+        self.timeout = timeout
+        self.history = history
+        self.shared = shared
+        self.secondary = secondary
+        self.breaker = breaker or CircuitBreaker("Google Sheets")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _record_history(self, rates: ExchangeRates):
+        if self.history is None:
+            return
+        try:
+            self.history.append(time.time(), rates)
+        except OSError as e:
+            logger.error(f"Ошибка записи истории курсов: {e}")
+
+    def fallback(self) -> Optional[ExchangeRates]:
+        """Снимок из резервного источника, если он настроен"""
+        return self.secondary.load() if self.secondary is not None else None
+
+    def read(self) -> ExchangeRates:
+        """Получение курсов из Google Sheets одним запросом
+
+        Ошибка подключения или чтения - RatesUnavailable. Если таблица не
+        настроена - резервный файл, а без него тестовые значения.
+        """
+        try:
+            sheet = self.sheets_client.worksheet()
+        except Exception as e:
+            self.sheets_client.reset()
+            raise RatesUnavailable(f"Ошибка подключения к Google Sheets: {e}") from e
+        if sheet is None:
+            return self.fallback() or DEFAULT_RATES
+
+        try:
+            with metrics.SHEETS_LATENCY.time():
+                values = sheet.get_values(self.rates_range)
+            rates = parse_rates(values)
+        except (ValueError, AttributeError) as e:
+            metrics.SHEETS_ERRORS.inc()
+            raise RatesUnavailable(f"Ошибка чтения курсов: {e}") from e
+        except Exception as e:
+            # Сетевая ошибка или отозванный токен - переподключимся в следующий раз
+            metrics.SHEETS_ERRORS.inc()
+            self.sheets_client.reset()
+            raise RatesUnavailable(f"Ошибка чтения курсов: {e}") from e
+
+        rates = replace(rates, fetched_at=time.time())
+        self._record_history(rates)
+        return rates
+
+    def load(self) -> ExchangeRates:
+        """Курсы из общего снимка, если он настроен, иначе из таблицы"""
+        if self.shared is not None:
+            return self.shared.load_or_fetch(self.read)
+        return self.read()
+
+    async def fetch(self) -> ExchangeRates:
+        """Асинхронное получение курсов с таймаутом"""
+        if not self.breaker.allow():
+            raise RatesUnavailable(f"Запросы к таблице приостановлены еще на {self.breaker.retry_in:.0f} с")
+
+        # gspread синхронный - выносим его из event loop в ограниченный пул потоков
+        loop = asyncio.get_running_loop()
+        ok = False
+        try:
+            async with self._semaphore:
+                rates = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, self.load),
+                    timeout=self.timeout
+                )
+            ok = True
+            return rates
+        finally:
+            self.breaker.record(ok)
+            metrics.RATE_SOURCE_CIRCUIT_OPEN.set(0 if self.breaker.closed else 1)
+
+class RateCache:
+    """Кэш курсов: снимок в памяти, обновляемый в фоне
+
+    fetch - корутина, возвращающая свежий снимок (RateSource.fetch),
+    fallback - резервный снимок или None (RateSource.fallback). После
+    неудачного обновления кэш отдает более новый из последнего известного
+    и резервного снимков с пометкой stale и пробует снова через
+    retry_interval секунд.
+    """
+
+    def __init__(self, ttl: float, fetch, fallback=None, retry_interval: Optional[float] = None):
+        self.ttl = ttl
+        self.retry_interval = ttl if retry_interval is None else retry_interval
+        self._fetch_rates = fetch
+        self._fallback = fallback
+        self._rates = None
+        # Время последней попытки обновления, удачной или нет
+        self._updated_at = 0.0
+        self._inflight = None
+        # Последнее обновление завершилось ошибкой
+        self.failing = False
+        # Растет при каждом изменении курсов; по нему сбрасываются производные кэши
+        self.version = 0
+        # Вызываются с новым снимком при каждом изменении курсов
+        self.listeners = []
+
+    @property
+    def ready(self) -> bool:
+        """Снимок уже получен хотя бы раз"""
+        return self._rates is not None
+
+    @property
+    def age(self) -> float:
+        """Сколько секунд прошло с последней попытки обновления"""
+        return time.monotonic() - self._updated_at
+
+    def get(self) -> ExchangeRates:
+        """Текущий снимок курсов без обращения к сети
+
+        Если снимка еще нет - RatesUnavailable: обработчик не ждет сеть,
+        а обновление запускается в фоне.
+        """
+        if self._rates is None:
+            metrics.RATE_CACHE_COLD.inc()
+            self._schedule_refresh()
+            raise RatesUnavailable("Курсы еще не получены")
+        if self.age > self.ttl:
+            # stale-while-revalidate: отдаем устаревший снимок, обновляем в фоне
+            metrics.RATE_CACHE_STALE.inc()
+            self._schedule_refresh()
+        else:
+            metrics.RATE_CACHE_FRESH.inc()
+        return self._rates
+
+    def _store(self, rates: ExchangeRates):
+        changed = rates != self._rates
+        if changed:
+            self.version += 1
+        self._rates = rates
+        self._updated_at = time.monotonic()
+        if changed:
+            for listener in self.listeners:
+                try:
+                    listener(rates)
+                except Exception as e:
+                    logger.error(f"Ошибка обработчика изменения курсов: {e}")
+
+    def _schedule_refresh(self):
+        if self._inflight is None:
+            asyncio.get_running_loop().create_task(self.try_refresh())
+
+    async def refresh(self) -> ExchangeRates:
+        """Обновление снимка из Google Sheets
+
+        Параллельные вызовы не порождают новых запросов, а ждут уже
+        выполняющийся и получают его результат.
+        """
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            self._inflight.add_done_callback(self._finish_fetch)
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> ExchangeRates:
+        try:
+            rates = await self._fetch_rates()
+        except Exception:
+            self.failing = True
+            self._degrade()
+            raise
+        self.failing = False
+        self._store(rates)
+        return rates
+
+    def _degrade(self):
+        # Более новый из последнего известного и резервного снимков
+        fallback = self._fallback() if self._fallback is not None else None
+        candidates = [rates for rates in (self._rates, fallback)
+                      if rates is not None and rates.source != DEFAULT_RATES.source]
+        if not candidates:
+            self._updated_at = time.monotonic()
+            return
+        rates = max(candidates, key=lambda candidate: candidate.fetched_at)
+        self._store(rates if rates.stale else replace(rates, stale=True))
+
+    def _finish_fetch(self, task: asyncio.Future):
+        self._inflight = None
+        if not task.cancelled():
+            # Ошибку получат ожидающие; помечаем ее как обработанную
+            task.exception()
+
+    async def try_refresh(self):
+        """Обновление снимка с логированием ошибок"""
+        try:
+            await self.refresh()
+        except asyncio.TimeoutError:
+            logger.error("Таймаут обновления курсов")
+        except Exception as e:
+            logger.error(f"Ошибка обновления курсов: {e}")
+
+    async def run(self):
+        """Фоновое обновление курсов каждые ttl секунд, после ошибки - через retry_interval"""
+        while True:
+            await asyncio.sleep(self.retry_interval if self.failing else self.ttl)
+            await self.try_refresh()
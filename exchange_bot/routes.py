@@ -0,0 +1,203 @@
+"""Граф курсов и лучший маршрут обмена между любыми валютами
+
+Вершины - валюты, ребро X → Y - сколько Y дают за 1 X с учетом комиссии.
+Ребра берутся из основных курсов таблицы (RUB ↔ USDT ↔ THB) и из
+дополнительных пар вида «X/Y» в столбце A (1 X = значение Y) с комиссией
+из столбца C. Лучший маршрут - кратчайший путь по весам -log(курс):
+все пары считаются сразу алгоритмом Флойда - Уоршелла, а если курсы
+только улучшились, расстояния обновляются за O(n²) на ребро без полного
+пересчета. Маршрут между двумя валютами после этого - поиск в словаре.
+"""
+import logging
+import math
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+
+from . import sender
+from . import templates
+
+logger = logging.getLogger(__name__)
+
+PAIR_RE = re.compile(r'^([A-Z]{2,6})\s*/\s*([A-Z]{2,6})$')
+
+# Погрешность сравнения сумм логарифмов
+EPSILON = 1e-12
+
+class Route(NamedTuple):
+    """Маршрут обмена: валюты по порядку и итоговый курс"""
+    path: Tuple[str, ...]
+    rate: float
+
+def rate_edges(rates) -> Dict[Tuple[str, str], float]:
+    """Ребра графа из снимка курсов: (из, в) → сколько «в» за 1 «из»"""
+    edges = {
+        ('RUB', 'USDT'): 1 / rates.rub_usdt,
+        ('USDT', 'RUB'): rates.rub_usdt,
+        ('USDT', 'THB'): rates.usdt_thb * (1 - rates.commission),
+        ('THB', 'USDT'): (1 - rates.commission) / rates.usdt_thb,
+    }
+    for label, value in rates.pairs.items():
+        match = PAIR_RE.match(label.strip().upper())
+        # Сравнение отсекает и NaN, и бесконечность
+        if match is None or not 0 < value < math.inf:
+            continue
+        base, quote = match.groups()
+        fee = rates.fees.get(label, 0.0)
+        edges[base, quote] = value * (1 - fee)
+        edges[quote, base] = (1 - fee) / value
+    return edges
+
+class RateGraph:
+    """Кратчайшие пути между всеми валютами с пересчетом при изменении ребер"""
+
+    def __init__(self):
+        self.currencies: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._edges: Dict[Tuple[str, str], float] = {}
+        self._distance = np.zeros((0, 0))
+        self._next = np.zeros((0, 0), dtype=int)
+        self._routes: Dict[Tuple[str, str], Optional[Route]] = {}
+        self.full_recomputes = 0
+        self.incremental_updates = 0
+
+    def update(self, edges: Dict[Tuple[str, str], float]):
+        """Заменить ребра; пересчитать только то, что нужно"""
+        currencies = sorted({currency for edge in edges for currency in edge})
+        changed = {edge: rate for edge, rate in edges.items() if self._edges.get(edge) != rate}
+        if not changed and edges.keys() == self._edges.keys():
+            return
+
+        # Подешевевшие и новые ребра укладываются в текущие расстояния;
+        # удаленное или подорожавшее ребро может сломать найденные пути
+        worse = any(edge not in edges for edge in self._edges) or any(
+            edge in self._edges and rate < self._edges[edge] for edge, rate in changed.items()
+        )
+        self._edges = dict(edges)
+        self._routes = {}
+        if worse or currencies != self.currencies:
+            self._recompute(currencies)
+        else:
+            for edge, rate in changed.items():
+                self._relax(edge, rate)
+            self.incremental_updates += 1
+
+    def _recompute(self, currencies: List[str]):
+        self.currencies = currencies
+        self._index = {currency: i for i, currency in enumerate(currencies)}
+        n = len(currencies)
+        distance = np.full((n, n), np.inf)
+        hop = np.full((n, n), -1, dtype=int)
+        np.fill_diagonal(distance, 0.0)
+        np.fill_diagonal(hop, np.arange(n))
+        for (source, target), rate in self._edges.items():
+            i, j = self._index[source], self._index[target]
+            weight = -math.log(rate)
+            if weight < distance[i, j]:
+                distance[i, j] = weight
+                hop[i, j] = j
+
+        # Флойд - Уоршелл: строка и столбец k за шаг
+        for k in range(n):
+            via = distance[:, k, None] + distance[None, k, :]
+            better = via < distance - EPSILON
+            distance = np.where(better, via, distance)
+            hop = np.where(better, hop[:, k, None], hop)
+
+        self._distance = distance
+        self._next = hop
+        self.full_recomputes += 1
+
+    def _relax(self, edge: Tuple[str, str], rate: float):
+        # Подешевевшее ребро u → v: путь i → u → v → j мог стать короче
+        u, v = self._index[edge[0]], self._index[edge[1]]
+        via = self._distance[:, u, None] + (-math.log(rate)) + self._distance[None, v, :]
+        better = via < self._distance - EPSILON
+        first_hop = self._next[:, u].copy()
+        first_hop[u] = v
+        self._distance = np.where(better, via, self._distance)
+        self._next = np.where(better, first_hop[:, None], self._next)
+
+    def route(self, source: str, target: str) -> Optional[Route]:
+        """Лучший маршрут source → target или None, если пути нет"""
+        key = (source, target)
+        if key not in self._routes:
+            self._routes[key] = self._build_route(source, target)
+        return self._routes[key]
+
+    def _build_route(self, source: str, target: str) -> Optional[Route]:
+        if source not in self._index or target not in self._index or source == target:
+            return None
+        j = self._index[target]
+        path = [self._index[source]]
+        while path[-1] != j:
+            step = int(self._next[path[-1], j])
+            if step < 0 or step in path:
+                # Нет пути или цикл с выгодой (несогласованные курсы в таблице)
+                if step >= 0:
+                    logger.warning(f"Арбитражный цикл в курсах на пути {source} → {target}")
+                return None
+            path.append(step)
+
+        names = tuple(self.currencies[i] for i in path)
+        rate = 1.0
+        for edge in zip(names, names[1:]):
+            rate *= self._edges[edge]
+        return Route(names, rate)
+
+class RouteEngine:
+    """Граф, синхронизированный со снимком курсов по его версии
+
+    Создается в create_app и приходит в обработчик аргументом route_engine.
+    """
+
+    def __init__(self):
+        self.graph = RateGraph()
+        self.version = None
+
+    def sync(self, rates, version: int) -> RateGraph:
+        if version != self.version:
+            self.graph.update(rate_edges(rates))
+            self.version = version
+        return self.graph
+
+def format_route(amount: float, route: Route) -> str:
+    return (
+        f"💱 <b>{amount:,.2f} {route.path[0]} → {amount * route.rate:,.2f} {route.path[-1]}</b>\n\n"
+        f"Маршрут: {' → '.join(route.path)}\n"
+        f"Курс: 1 {route.path[0]} = <b>{route.rate:.6g}</b> {route.path[-1]}"
+    )
+
+async def quote(message: types.Message, command: CommandObject, rate_cache, route_engine: RouteEngine):
+    """Расчет по лучшему маршруту: /quote 50000 RUB THB"""
+    rates = rate_cache.get()
+    graph = route_engine.sync(rates, rate_cache.version)
+    try:
+        amount, source, target = (command.args or '').split()
+        amount = float(amount.replace(',', '.'))
+    except ValueError:
+        await message.answer(
+            "Формат: /quote <сумма> <из> <в>, например /quote 50000 RUB THB\n"
+            f"Валюты: {', '.join(graph.currencies)}"
+        )
+        return
+
+    route = graph.route(source.upper(), target.upper())
+    if route is None:
+        await message.answer(
+            f"❌ Нет маршрута {source.upper()} → {target.upper()}\n"
+            f"Валюты: {', '.join(graph.currencies)}"
+        )
+        return
+
+    with sender.priority(sender.HIGH):
+        await message.answer(format_route(amount, route) + templates.rates_notice(rates), parse_mode="HTML")
+
+def build_router() -> Router:
+    """Роутер /quote"""
+    router = Router(name=__name__)
+    router.message.register(quote, Command("quote"))
+    return router
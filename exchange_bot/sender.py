@@ -0,0 +1,207 @@
+"""Исходящие сообщения в пределах лимитов Telegram
+
+Запросы к чатам проходят через маркерные корзины: общую на бота и свою
+на каждый чат. Общая очередь обслуживается по приоритетам, поэтому
+результаты расчетов уходят раньше меню и рассылок. На TelegramRetryAfter
+чат ставится на паузу и запрос повторяется. SendQueue склеивает
+накопившиеся уведомления для одного чата в одно сообщение.
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше - раньше
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+send_priority: ContextVar[int] = ContextVar('send_priority', default=NORMAL)
+
+@contextlib.contextmanager
+def priority(level: int):
+    """Приоритет запросов к Telegram внутри блока"""
+    token = send_priority.set(level)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    """Маркерная корзина: rate маркеров в секунду, не больше capacity
+
+    Маркеры можно брать в долг: reserve() сразу списывает маркер и
+    возвращает, сколько ждать до момента, когда он был бы доступен.
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет доступен маркер"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """Списать маркер; вернуть время ожидания"""
+        wait = self.delay(now)
+        self.tokens -= 1
+        return wait
+
+    def pause(self, now: float, seconds: float):
+        """Запрет отправки на seconds секунд (после flood control)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class OutgoingLimiter:
+    """Общий и по-чатовые лимиты отправки с приоритетной очередью"""
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float,
+                 group_rate: float):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._pump_task = None
+
+    def chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 10000:
+                self._prune()
+            # В группах лимит строже: около 20 сообщений в минуту
+            rate = self.group_rate if isinstance(chat_id, str) or chat_id < 0 else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items() if bucket.idle(now)]:
+            del self._chats[chat_id]
+
+    async def acquire(self, chat_id, level: int):
+        """Дождаться права отправить сообщение в чат"""
+        wait = self.chat_bucket(chat_id).reserve(time.monotonic())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._sequence), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self):
+        # Выдает общие маркеры ожидающим в порядке приоритета
+        while self._waiters:
+            wait = self._global.delay(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._global.reserve(time.monotonic())
+                future.set_result(None)
+
+    def pause_chat(self, chat_id, seconds: float):
+        self.chat_bucket(chat_id).pause(time.monotonic(), seconds)
+
+class FloodControlMiddleware(BaseRequestMiddleware):
+    """Лимиты и повтор после flood control для запросов с chat_id"""
+
+    def __init__(self, limiter: OutgoingLimiter, max_retries: int = 3):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            # getUpdates, answerInlineQuery и т.п. не ограничиваем
+            return await make_request(bot, method)
+
+        level = send_priority.get()
+        for attempt in itertools.count():
+            await self.limiter.acquire(chat_id, level)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Flood control в чате {chat_id}, повтор через {e.retry_after} с")
+                self.limiter.pause_chat(chat_id, e.retry_after)
+
+class SendQueue:
+    """Фоновая отправка уведомлений с объединением по чатам
+
+    Пока уведомление ждет отправки, новые тексты для того же чата
+    дописываются к нему, если помещаются в одно сообщение. Отправляют
+    несколько задач сразу, скорость ограничивает FloodControlMiddleware.
+    """
+
+    def __init__(self, bot: Bot, workers: int = 8, max_length: int = 4096):
+        self.bot = bot
+        self.workers = workers
+        self.max_length = max_length
+        self._pending: Dict[int, list] = {}
+        self._order: asyncio.Queue = asyncio.Queue()
+        self._tasks = []
+
+    def enqueue(self, chat_id: int, text: str, **kwargs):
+        """Поставить текст в очередь на отправку"""
+        batch = self._pending.get(chat_id)
+        if batch is None:
+            self._pending[chat_id] = [(text, kwargs)]
+            self._order.put_nowait(chat_id)
+            self._start()
+            return
+
+        last_text, last_kwargs = batch[-1]
+        merged = f"{last_text}\n\n{text}"
+        if last_kwargs == kwargs and len(merged) <= self.max_length:
+            batch[-1] = (merged, kwargs)
+        else:
+            batch.append((text, kwargs))
+
+    def _start(self):
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < min(self.workers, self._order.qsize()):
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def _run(self):
+        while not self._order.empty():
+            chat_id = self._order.get_nowait()
+            for text, kwargs in self._pending.pop(chat_id, ()):
+                try:
+                    with priority(LOW):
+                        await self.bot.send_message(chat_id, text, **kwargs)
+                except Exception as e:
+                    logger.error(f"Не удалось отправить уведомление в чат {chat_id}: {e}")
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
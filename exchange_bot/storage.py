@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
+
+# Как часто (в записях) чистить истекшие состояния
+PURGE_EVERY = 1000
+
+class SQLiteDatabase:
+    """Файл SQLite в режиме WAL
+
+    Соединение открывается лениво и заново в каждом процессе: унаследованное
+    после fork соединение использовать нельзя. То же с потоком для run().
+    """
+
+    def __init__(self, path: str, schema=(), migrations=()):
+        self.path = path
+        self.schema = schema
+        self.migrations = migrations
+        self._pid = None
+        self._connection = None
+        self._executor = None
+        self._executor_pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Запросы идут то из event loop, то из потока run() - но никогда одновременно
+            self._connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            for statement in self.schema:
+                self._connection.execute(statement)
+            for statement in self.migrations:
+                try:
+                    self._connection.execute(statement)
+                except sqlite3.OperationalError:
+                    # Уже применена
+                    pass
+            self._pid = os.getpid()
+        return self._connection
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.connection.execute(sql, parameters)
+
+    async def run(self, function, *args):
+        """function(*args) в отдельном потоке этой базы
+
+        Поток один, поэтому запросы не пересекаются, а ожидание блокировки
+        записи другим процессом (до busy_timeout) не останавливает event loop.
+        """
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+            self._executor_pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._executor_pid = None
+
+def storage_key_id(key: StorageKey) -> str:
+    """Строковый ключ FSM для хранения в базе"""
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в SQLite
+
+    База работает в режиме WAL: чтения не блокируются записью, и один файл
+    можно открыть из нескольких процессов. Поиск идет по первичному ключу,
+    брошенные состояния истекают через ttl секунд после последнего изменения.
+    Обычно запрос к локальному файлу занимает десятки микросекунд, но пока
+    другой процесс пишет, он ждет блокировку до busy_timeout (5 с), поэтому
+    запросы выполняются в потоке базы (SQLiteDatabase.run), а не в event loop.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._writes = 0
+        self._db = SQLiteDatabase(path, (
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}', expires_at REAL)",
+            "CREATE INDEX IF NOT EXISTS fsm_expires_at ON fsm (expires_at)"
+        ))
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl else None
+
+    def _row(self, key: StorageKey):
+        row = self._db.execute(
+            "SELECT state, data, expires_at FROM fsm WHERE key = ?", (storage_key_id(key),)
+        ).fetchone()
+        if row is None or (row[2] is not None and row[2] < time.time()):
+            return None, '{}'
+        return row[0], row[1]
+
+    def _written(self, key: str):
+        # Пустые записи не храним
+        self._db.execute(
+            "DELETE FROM fsm WHERE key = ? AND state IS NULL AND data = '{}'", (key,)
+        )
+        self._writes += 1
+        if self.ttl and self._writes % PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Удаление истекших состояний"""
+        cursor = self._db.execute("DELETE FROM fsm WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def _set_state(self, key_id: str, value: Optional[str]):
+        self._db.execute(
+            "INSERT INTO fsm (key, state, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at, "
+            "data = CASE WHEN fsm.expires_at < ? THEN '{}' ELSE fsm.data END",
+            (key_id, value, self._expires_at(), time.time())
+        )
+        self._written(key_id)
+
+    def _set_data(self, key_id: str, data: str):
+        self._db.execute(
+            "INSERT INTO fsm (key, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at, "
+            "state = CASE WHEN fsm.expires_at < ? THEN NULL ELSE fsm.state END",
+            (key_id, data, self._expires_at(), time.time())
+        )
+        self._written(key_id)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._db.run(self._set_state, storage_key_id(key), value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._db.run(self._row, key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._db.run(self._set_data, storage_key_id(key), json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return json.loads((await self._db.run(self._row, key))[1])
+
+    async def close(self) -> None:
+        await self._db.run(self._db.close)
+
+def create_storage(kind: str, redis_url: str = '', sqlite_path: str = '',
+                   ttl: Optional[int] = None) -> BaseStorage:
+    """FSM-хранилище по названию: memory, redis или sqlite"""
+    if kind == 'memory':
+        return MemoryStorage()
+    if kind == 'redis':
+        # Пакет redis из requirements.txt; для локальной проверки подойдет fakeredis
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(redis_url, state_ttl=ttl, data_ttl=ttl)
+    if kind == 'sqlite':
+        return SQLiteStorage(sqlite_path, ttl=ttl)
+    raise ValueError(f"Неизвестное FSM-хранилище: {kind}")
+
+def create_isolation(storage: BaseStorage) -> BaseEventIsolation:
+    """Очередность обновлений одного чата
+
+    Redis дает блокировки, общие для всех процессов; для остальных
+    хранилищ обновления упорядочиваются только внутри процесса, поэтому
+    с несколькими процессами вебхука они не запускаются (app.run_webhook).
+    """
+    if hasattr(storage, 'create_isolation'):
+        return storage.create_isolation()
+    return SimpleEventIsolation()
+
+class CalculationRecord:
+    """Последний расчет пользователя"""
+    __slots__ = ('scenario', 'result', 'touched_at', 'calculated_at')
+
+    def __init__(self, scenario: int, result: Dict[str, Any], touched_at: float,
+                 calculated_at: Optional[float] = None):
+        self.scenario = scenario
+        self.result = result
+        self.touched_at = touched_at
+        # Момент расчета - по нему результат можно пересчитать по истории курсов
+        self.calculated_at = touched_at if calculated_at is None else calculated_at
+
+class SQLiteCalculationBackend:
+    """Постоянное хранение последних расчетов в SQLite
+
+    Пока другой процесс вебхука пишет в базу, запрос ждет блокировку до
+    busy_timeout, поэтому запросы выполняются в потоке базы, как в SQLiteStorage.
+    """
+
+    def __init__(self, path: str):
+        self._db = SQLiteDatabase(path, (
+            "CREATE TABLE IF NOT EXISTS last_calculation ("
+            "user_id INTEGER PRIMARY KEY, scenario INTEGER NOT NULL, "
+            "result TEXT NOT NULL, touched_at REAL NOT NULL, calculated_at REAL)",
+            "CREATE INDEX IF NOT EXISTS last_calculation_touched_at ON last_calculation (touched_at)",
+        ), migrations=(
+            "ALTER TABLE last_calculation ADD COLUMN calculated_at REAL",
+        ))
+
+    def _load(self, user_id: int) -> Optional[CalculationRecord]:
+        row = self._db.execute(
+            "SELECT scenario, result, touched_at, calculated_at FROM last_calculation "
+            "WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CalculationRecord(row[0], json.loads(row[1]), row[2], row[3])
+
+    async def load(self, user_id: int) -> Optional[CalculationRecord]:
+        return await self._db.run(self._load, user_id)
+
+    async def save(self, user_id: int, record: CalculationRecord):
+        await self._db.run(
+            self._db.execute,
+            "INSERT OR REPLACE INTO last_calculation "
+            "(user_id, scenario, result, touched_at, calculated_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, record.scenario, json.dumps(record.result), record.touched_at,
+             record.calculated_at)
+        )
+
+    async def touch(self, user_id: int, touched_at: float):
+        await self._db.run(
+            self._db.execute,
+            "UPDATE last_calculation SET touched_at = ? WHERE user_id = ?", (touched_at, user_id)
+        )
+
+    async def delete(self, user_id: int):
+        await self._db.run(self._db.execute, "DELETE FROM last_calculation WHERE user_id = ?", (user_id,))
+
+    async def purge_expired(self, before: float) -> int:
+        cursor = await self._db.run(
+            self._db.execute, "DELETE FROM last_calculation WHERE touched_at < ?", (before,)
+        )
+        return cursor.rowcount
+
+    async def close(self):
+        await self._db.run(self._db.close)
+
+class CalculationStore:
+    """Последние расчеты пользователей с ограничением памяти
+
+    В памяти хранится не больше max_size записей: при переполнении
+    вытесняется давно не использованная (LRU), а записи без обращений
+    дольше ttl секунд удаляются. Если задан backend, записи дублируются
+    в него и подгружаются обратно после вытеснения или перезапуска; время
+    обращения пишется в backend и при чтении, поэтому ttl там тоже
+    отсчитывается от последнего обращения.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None,
+                 backend: Optional[SQLiteCalculationBackend] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._records: "OrderedDict[int, CalculationRecord]" = OrderedDict()
+        self._writes = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _expired(self, record: CalculationRecord, now: float) -> bool:
+        return bool(self.ttl) and now - record.touched_at > self.ttl
+
+    def _evict(self, now: float):
+        # В начале словаря - самые давние обращения
+        while self._records:
+            user_id, record = next(iter(self._records.items()))
+            if len(self._records) <= self.max_size and not self._expired(record, now):
+                break
+            del self._records[user_id]
+
+    async def get(self, user_id: int) -> Optional[CalculationRecord]:
+        """Последний расчет пользователя или None"""
+        now = time.time()
+        record = self._records.get(user_id)
+        if record is None and self.backend is not None:
+            record = await self.backend.load(user_id)
+            if record is not None:
+                self._records[user_id] = record
+        if record is None:
+            return None
+
+        if self._expired(record, now):
+            await self.delete(user_id)
+            return None
+
+        record.touched_at = now
+        self._records.move_to_end(user_id)
+        self._evict(now)
+        if self.backend is not None:
+            await self.backend.touch(user_id, now)
+        return record
+
+    async def set(self, user_id: int, scenario: int, result: Dict[str, Any]) -> CalculationRecord:
+        """Сохранение результата расчета"""
+        now = time.time()
+        record = CalculationRecord(scenario, result, now)
+        self._records[user_id] = record
+        self._records.move_to_end(user_id)
+        self._evict(now)
+        if self.backend is not None:
+            await self.backend.save(user_id, record)
+            # По счетчику записей, а не по размеру словаря: заполненный LRU не меняет размер
+            self._writes += 1
+            if self.ttl and self._writes % PURGE_EVERY == 0:
+                await self.backend.purge_expired(now - self.ttl)
+        return record
+
+    async def delete(self, user_id: int):
+        self._records.pop(user_id, None)
+        if self.backend is not None:
+            await self.backend.delete(user_id)
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
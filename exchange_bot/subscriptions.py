@@ -0,0 +1,165 @@
+"""Подписки на изменение курсов
+
+Пользователь задает порог в процентах (/subscribe 0.5). Подписчики
+сгруппированы по порогу, у каждой группы свой базовый снимок - курсы на
+момент последнего уведомления группы. При обновлении курсов проверяются
+только группы, а списки подписчиков читаются лишь у тех, где изменение
+превысило порог. Уведомления уходят через SendQueue с низким приоритетом.
+Базу SQLite могут открыть несколько процессов: базовый снимок группы
+обновляется условным UPDATE, поэтому уведомление отправляет только один.
+"""
+import logging
+from typing import List, Tuple
+
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+
+from .storage import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# Пороги округляются до сотых процента, чтобы групп было немного
+THRESHOLD_DIGITS = 2
+MIN_THRESHOLD = 0.01
+DEFAULT_THRESHOLD = 1.0
+
+def effective_rate(rates) -> float:
+    """Итоговый курс RUB/THB с учетом комиссии"""
+    return rates.rub_usdt / (rates.usdt_thb * (1 - rates.commission))
+
+def rate_change(old, new) -> float:
+    """Наибольшее относительное изменение курсов, в процентах"""
+    return 100 * max(
+        abs(new.usdt_thb / old.usdt_thb - 1),
+        abs(new.rub_usdt / old.rub_usdt - 1),
+        abs(effective_rate(new) / effective_rate(old) - 1),
+    )
+
+def format_change(old, new, change: float) -> str:
+    return (
+        f"📈 <b>Курсы изменились на {change:.2f}%</b>\n\n"
+        f"USDT → THB: {old.usdt_thb} → <b>{new.usdt_thb}</b>\n"
+        f"RUB → USDT: {old.rub_usdt} → <b>{new.rub_usdt}</b>\n"
+        f"Итоговый курс RUB/THB: {effective_rate(old):.4f} → <b>{effective_rate(new):.4f}</b>\n\n"
+        f"<i>Отписаться: /unsubscribe</i>"
+    )
+
+class Baseline:
+    __slots__ = ('usdt_thb', 'rub_usdt', 'commission')
+
+    def __init__(self, usdt_thb: float, rub_usdt: float, commission: float):
+        self.usdt_thb = usdt_thb
+        self.rub_usdt = rub_usdt
+        self.commission = commission
+
+class SubscriptionStore:
+    """Подписчики, сгруппированные по порогу, в SQLite"""
+
+    def __init__(self, path: str):
+        self._db = SQLiteDatabase(path, (
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            "chat_id INTEGER PRIMARY KEY, threshold REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS subscriptions_threshold ON subscriptions (threshold)",
+            "CREATE TABLE IF NOT EXISTS subscription_buckets ("
+            "threshold REAL PRIMARY KEY, usdt_thb REAL NOT NULL, rub_usdt REAL NOT NULL, "
+            "commission REAL NOT NULL)",
+        ))
+
+    def subscribe(self, chat_id: int, threshold: float, rates) -> float:
+        """Подписать чат; вернуть порог после округления"""
+        threshold = max(MIN_THRESHOLD, round(threshold, THRESHOLD_DIGITS))
+        self._db.execute(
+            "INSERT OR REPLACE INTO subscriptions (chat_id, threshold) VALUES (?, ?)",
+            (chat_id, threshold)
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO subscription_buckets (threshold, usdt_thb, rub_usdt, commission) "
+            "VALUES (?, ?, ?, ?)", (threshold, rates.usdt_thb, rates.rub_usdt, rates.commission)
+        )
+        self._drop_empty_buckets()
+        return threshold
+
+    def unsubscribe(self, chat_id: int) -> bool:
+        deleted = self._db.execute("DELETE FROM subscriptions WHERE chat_id = ?", (chat_id,)).rowcount
+        self._drop_empty_buckets()
+        return bool(deleted)
+
+    def _drop_empty_buckets(self):
+        self._db.execute(
+            "DELETE FROM subscription_buckets WHERE threshold NOT IN "
+            "(SELECT DISTINCT threshold FROM subscriptions)"
+        )
+
+    def triggered(self, rates) -> List[Tuple[Baseline, float, List[int]]]:
+        """Группы, где изменение превысило порог: (старый снимок, изменение, чаты)
+
+        Базовый снимок сработавшей группы сразу переносится на rates.
+        """
+        result = []
+        buckets = self._db.execute(
+            "SELECT threshold, usdt_thb, rub_usdt, commission FROM subscription_buckets"
+        ).fetchall()
+        for threshold, *values in buckets:
+            old = Baseline(*values)
+            change = rate_change(old, rates)
+            if change < threshold:
+                continue
+            # Условное обновление: другой процесс мог уже разослать это изменение
+            claimed = self._db.execute(
+                "UPDATE subscription_buckets SET usdt_thb = ?, rub_usdt = ?, commission = ? "
+                "WHERE threshold = ? AND usdt_thb = ? AND rub_usdt = ? AND commission = ?",
+                (rates.usdt_thb, rates.rub_usdt, rates.commission, threshold, *values)
+            ).rowcount
+            if not claimed:
+                continue
+            chats = [row[0] for row in self._db.execute(
+                "SELECT chat_id FROM subscriptions WHERE threshold = ?", (threshold,)
+            )]
+            result.append((old, change, chats))
+        return result
+
+    def close(self):
+        self._db.close()
+
+def notify_subscribers(store: SubscriptionStore, send_queue, rates) -> int:
+    """Разослать уведомления об изменении курсов; вернуть число чатов"""
+    sent = 0
+    for old, change, chats in store.triggered(rates):
+        text = format_change(old, rates, change)
+        for chat_id in chats:
+            send_queue.enqueue(chat_id, text, parse_mode="HTML")
+        sent += len(chats)
+    if sent:
+        logger.info(f"Уведомления об изменении курсов: {sent} чатов")
+    return sent
+
+async def subscribe(message: types.Message, command: CommandObject, subscriptions: SubscriptionStore,
+                    rate_cache):
+    """Подписка на изменение курсов: /subscribe <порог в процентах>"""
+    try:
+        threshold = float((command.args or str(DEFAULT_THRESHOLD)).strip().rstrip('%').replace(',', '.'))
+        if threshold <= 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("Формат: /subscribe <порог в процентах>, например /subscribe 0.5")
+        return
+
+    threshold = subscriptions.subscribe(message.chat.id, threshold, rate_cache.get())
+    await message.answer(
+        f"🔔 Пришлю уведомление, когда курсы изменятся больше чем на {threshold}%\n"
+        f"Отписаться: /unsubscribe"
+    )
+
+async def unsubscribe(message: types.Message, subscriptions: SubscriptionStore):
+    """Отписка от уведомлений"""
+    if subscriptions.unsubscribe(message.chat.id):
+        await message.answer("🔕 Подписка отменена")
+    else:
+        await message.answer("Подписки не было. Подписаться: /subscribe <порог в процентах>")
+
+def build_router() -> Router:
+    """Роутер /subscribe и /unsubscribe"""
+    router = Router(name=__name__)
+    router.message.register(subscribe, Command("subscribe"))
+    router.message.register(unsubscribe, Command("unsubscribe"))
+    return router
@@ -0,0 +1,180 @@
+"""Клавиатуры и шаблоны сообщений
+
+Все клавиатуры создаются один раз при импорте, а их JSON для запроса к
+Telegram готовится один раз на клавиатуру в PrebuiltMarkupSession.
+Результат каждого сценария отображается одним заранее разобранным
+шаблоном - в ответе на расчет, в перерасчете и в инлайн-режиме.
+"""
+import time
+from string import Formatter
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import (InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton,
+                           ReplyKeyboardMarkup, ReplyKeyboardRemove)
+from aiohttp import FormData
+
+class Template:
+    """Шаблон str.format, разобранный один раз"""
+    __slots__ = ('_parts',)
+
+    def __init__(self, source: str):
+        self._parts = [
+            (literal, field, spec or '')
+            for literal, field, spec, _ in Formatter().parse(source)
+        ]
+
+    def render(self, values) -> str:
+        return ''.join(
+            literal if field is None else literal + format(values[field], spec)
+            for literal, field, spec in self._parts
+        )
+
+# Строки результата каждого сценария
+SCENARIO_BODIES = {
+    1: ("💵 Рубли: <b>{rubles:,.2f}</b>\n"
+        "📊 Курс для клиента: <b>{client_rate}</b>\n"
+        "🇹🇭 Баты для клиента: <b>{thb_client:,.2f}</b>\n"
+        "💰 Ваш профит: <b>{profit:,.2f}</b> THB"),
+    2: ("🇹🇭 Баты: <b>{baht:,.2f}</b>\n"
+        "📊 Курс для клиента: <b>{client_rate}</b>\n"
+        "💵 Рублей от клиента: <b>{rubles_client:,.2f}</b>\n"
+        "💰 Ваш профит: <b>{profit:,.2f}</b> THB"),
+    3: ("💵 Рубли: <b>{rubles:,.2f}</b>\n"
+        "💰 Желаемый профит: <b>{desired_profit:,.2f}</b> THB\n"
+        "🇹🇭 Баты для клиента: <b>{thb_client:,.2f}</b>\n"
+        "📊 Курс для клиента: <b>{client_rate}</b>"),
+    4: ("🇹🇭 Баты: <b>{baht:,.2f}</b>\n"
+        "💰 Желаемый профит: <b>{desired_profit:,.2f}</b> THB\n"
+        "💵 Рублей от клиента: <b>{rubles_client:,.2f}</b>\n"
+        "📊 Курс для клиента: <b>{client_rate}</b>"),
+}
+
+# Справочная строка под результатом расчета
+SCENARIO_FOOTERS = {
+    1: "<i>Реальный курс: {real_rate}</i>",
+    2: "<i>Реальная стоимость: {rubles_real:,.2f} RUB</i>",
+    3: "<i>Реальная сумма: {thb_real:,.2f} THB</i>",
+    4: "<i>Реальная стоимость: {rubles_real:,.2f} RUB</i>",
+}
+
+RESULT_TEMPLATES = {
+    scenario: Template(f"✅ <b>Результат расчета:</b>\n\n{body}\n\n{SCENARIO_FOOTERS[scenario]}")
+    for scenario, body in SCENARIO_BODIES.items()
+}
+RECALC_TEMPLATES = {
+    scenario: Template(f"✅ <b>Пересчет:</b>\n\n{body}") for scenario, body in SCENARIO_BODIES.items()
+}
+QUOTE_TEMPLATES = {scenario: Template(body) for scenario, body in SCENARIO_BODIES.items()}
+
+def result_text(scenario: int, result) -> str:
+    return RESULT_TEMPLATES[scenario].render(result)
+
+def recalculation_text(scenario: int, result) -> str:
+    return RECALC_TEMPLATES[scenario].render(result)
+
+def quote_text(scenario: int, result) -> str:
+    return QUOTE_TEMPLATES[scenario].render(result)
+
+def format_age(seconds: float) -> str:
+    """Возраст снимка словами: 40 с, 5 мин, 3 ч, 2 дн"""
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds} с"
+    if seconds < 3600:
+        return f"{seconds // 60} мин"
+    if seconds < 86400:
+        return f"{seconds // 3600} ч"
+    return f"{seconds // 86400} дн"
+
+def rates_notice(rates, now: float = None) -> str:
+    """Предупреждение под ответом, если курсы не из таблицы или устарели"""
+    now = time.time() if now is None else now
+    if rates.source == 'default':
+        return "\n\n⚠️ <i>Тестовые курсы: Google Sheets не настроен</i>"
+    if rates.source == 'file':
+        return f"\n\n⚠️ <i>Курсы из резервного файла, обновлены {format_age(now - rates.fetched_at)} назад</i>"
+    if rates.stale:
+        return f"\n\n⚠️ <i>Таблица курсов недоступна: курсы получены {format_age(now - rates.fetched_at)} назад</i>"
+    return ''
+
+class RecalcCallback(CallbackData, prefix='rc'):
+    """Кнопка перерасчета: какое значение меняем"""
+    field: str
+
+class MenuCallback(CallbackData, prefix='menu'):
+    """Кнопка возврата в главное меню"""
+
+# Что можно изменить в каждом сценарии: (поле, подпись кнопки)
+RECALC_FIELDS = {
+    1: [('rubles', "🔄 Изменить рубли"), ('rate', "🔄 Изменить курс")],
+    2: [('baht', "🔄 Изменить баты"), ('rate', "🔄 Изменить курс")],
+    3: [('rubles', "🔄 Изменить рубли"), ('profit', "🔄 Изменить профит")],
+    4: [('baht', "🔄 Изменить баты"), ('profit', "🔄 Изменить профит")],
+}
+
+# Главная клавиатура с выбором сценария
+MAIN_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="💰 Рубли + Курс → Баты")],
+        [KeyboardButton(text="🇹🇭 Баты + Курс → Рубли")],
+        [KeyboardButton(text="📊 Рубли + Профит → Баты")],
+        [KeyboardButton(text="💵 Баты + Профит → Рубли")],
+        [KeyboardButton(text="📈 Текущие курсы")],
+    ],
+    resize_keyboard=True
+)
+
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
+
+# Инлайн-клавиатуры перерасчета по сценариям
+RECALC_KEYBOARDS = {
+    scenario: InlineKeyboardMarkup(inline_keyboard=[
+        *([InlineKeyboardButton(text=label, callback_data=RecalcCallback(field=field).pack())]
+          for field, label in fields),
+        [InlineKeyboardButton(text="◀️ Главное меню", callback_data=MenuCallback().pack())],
+    ])
+    for scenario, fields in RECALC_FIELDS.items()
+}
+
+class PrebuiltMarkupSession(AiohttpSession):
+    """Сессия, которая сериализует готовые клавиатуры один раз
+
+    Обычно reply_markup превращается в JSON заново при каждой отправке.
+    Для клавиатур из этого модуля JSON берется из кэша по объекту.
+    Повторяет AiohttpSession.build_form_data из aiogram 3.3.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._markups = {}
+        for markup in (MAIN_KEYBOARD, REMOVE_KEYBOARD, *RECALC_KEYBOARDS.values()):
+            self._markups[id(markup)] = (markup, None)
+
+    def _serialized_markup(self, bot, markup):
+        entry = self._markups.get(id(markup))
+        if entry is None or entry[0] is not markup:
+            return None
+        if entry[1] is None:
+            entry = self._markups[id(markup)] = (
+                markup, self.prepare_value(markup.model_dump(warnings=False), bot=bot, files={})
+            )
+        return entry[1]
+
+    def build_form_data(self, bot, method) -> FormData:
+        markup = getattr(method, 'reply_markup', None)
+        serialized = self._serialized_markup(bot, markup) if markup is not None else None
+        if serialized is None:
+            return super().build_form_data(bot, method)
+
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={'reply_markup'}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field('reply_markup', serialized)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
@@ -0,0 +1,244 @@
+"""Ограничение частоты обновлений от одного пользователя
+
+Не больше limit обновлений за скользящее окно в window секунд. Проверка
+идет в outer middleware, который create_app ставит перед встроенным
+FSMContextMiddleware: отклоненное обновление не берет блокировку чата,
+не читает FSM-состояние, не считает и не ходит в сеть. О превышении
+пользователь узнает один раз за окно, остальное молча отбрасывается.
+Операторы из списка allowlist не ограничиваются, инлайн-запросы не
+считаются: они приходят на каждый набранный символ и отвечаются из памяти.
+
+Счетчики хранятся в памяти процесса (точное окно по отметкам времени)
+или, чтобы лимит был общим для нескольких процессов, в SQLite или Redis
+(окно приближается двумя соседними интервалами: счетчик прошлого
+интервала учитывается с весом оставшейся в окне доли).
+"""
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from . import metrics
+from .storage import PURGE_EVERY, SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей помнить в памяти процесса
+MAX_TRACKED_USERS = 100000
+# Типы обновлений, которые не ограничиваются
+EXEMPT_UPDATE_TYPES = frozenset({'inline_query', 'chosen_inline_result'})
+
+class MemoryRateLimiter:
+    """Скользящее окно в памяти: последние limit отметок на пользователя"""
+
+    def __init__(self, limit: int, window: float, max_users: int = MAX_TRACKED_USERS):
+        self.limit = limit
+        self.window = window
+        self.max_users = max_users
+        self._hits: "OrderedDict[int, deque]" = OrderedDict()
+
+    def _prune(self, now: float):
+        # В начале словаря - давно не писавшие пользователи
+        while self._hits:
+            user_id, hits = next(iter(self._hits.items()))
+            if len(self._hits) < self.max_users and now - hits[-1] < self.window:
+                break
+            del self._hits[user_id]
+
+    async def hit(self, user_id: int) -> float:
+        """Учесть обновление: 0 - разрешено, иначе через сколько секунд можно снова"""
+        now = time.monotonic()
+        hits = self._hits.get(user_id)
+        if hits is None:
+            if len(self._hits) >= self.max_users:
+                self._prune(now)
+            hits = self._hits[user_id] = deque(maxlen=self.limit)
+        elif len(hits) == self.limit:
+            retry_after = hits[0] + self.window - now
+            if retry_after > 0:
+                return retry_after
+        hits.append(now)
+        self._hits.move_to_end(user_id)
+        return 0.0
+
+    async def close(self):
+        pass
+
+# Минимальное ожидание: отказ всегда отличается от разрешения (0)
+MIN_RETRY_AFTER = 0.001
+
+def window_retry_after(limit: int, window: float, now: float, previous: int, current: int) -> float:
+    """Проверка по двум интервалам: 0 - разрешено, иначе через сколько секунд можно снова
+
+    current - обновления в текущем интервале [start, start + window),
+    previous - в предыдущем.
+    """
+    start = now - now % window
+    elapsed = (now - start) / window
+    if previous * (1 - elapsed) + current < limit:
+        return 0.0
+    if current < limit:
+        # Вес прошлого интервала уменьшится достаточно еще в этом интервале
+        retry_at = start + (1 - (limit - current) / previous) * window
+    else:
+        # В следующем интервале текущий счетчик станет прошлым
+        retry_at = start + window + (1 - limit / current) * window
+    return max(retry_at - now, MIN_RETRY_AFTER)
+
+class SQLiteRateLimiter:
+    """Скользящее окно в SQLite, общее для процессов на одной машине
+
+    Между чтением и записью другой процесс может добавить обновление,
+    поэтому под одновременной нагрузкой лимит может быть превышен на
+    единицы - для защиты от флуда этого достаточно.
+    """
+
+    def __init__(self, path: str, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._writes = 0
+        self._db = SQLiteDatabase(path, (
+            "CREATE TABLE IF NOT EXISTS throttle ("
+            "user_id INTEGER PRIMARY KEY, window_start REAL NOT NULL, "
+            "current INTEGER NOT NULL, previous INTEGER NOT NULL)",
+        ))
+
+    def _hit(self, user_id: int) -> float:
+        now = time.time()
+        start = now - now % self.window
+        row = self._db.execute(
+            "SELECT window_start, current, previous FROM throttle WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        current = previous = 0
+        if row is not None:
+            if row[0] == start:
+                current, previous = row[1], row[2]
+            elif row[0] == start - self.window:
+                previous = row[1]
+
+        retry_after = window_retry_after(self.limit, self.window, now, previous, current)
+        if retry_after:
+            return retry_after
+        self._db.execute(
+            "INSERT OR REPLACE INTO throttle (user_id, window_start, current, previous) "
+            "VALUES (?, ?, ?, ?)", (user_id, start, current + 1, previous)
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self._db.execute("DELETE FROM throttle WHERE window_start < ?", (start - self.window,))
+        return 0.0
+
+    async def hit(self, user_id: int) -> float:
+        # Запись другого процесса держит блокировку до busy_timeout - ждем ее в потоке базы
+        return await self._db.run(self._hit, user_id)
+
+    async def close(self):
+        await self._db.run(self._db.close)
+
+class RedisRateLimiter:
+    """Скользящее окно в Redis, общее для всех процессов
+
+    Счетчик каждого интервала - отдельный ключ, который истекает сам.
+    """
+
+    def __init__(self, redis, limit: int, window: float, prefix: str = 'throttle'):
+        self.redis = redis
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+
+    def _key(self, user_id: int, start: float) -> str:
+        return f"{self.prefix}:{user_id}:{int(start)}"
+
+    async def hit(self, user_id: int) -> float:
+        now = time.time()
+        start = now - now % self.window
+        previous, current = await self.redis.mget(
+            self._key(user_id, start - self.window), self._key(user_id, start)
+        )
+        retry_after = window_retry_after(
+            self.limit, self.window, now, int(previous or 0), int(current or 0)
+        )
+        if retry_after:
+            return retry_after
+        key = self._key(user_id, start)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, int(2 * self.window) + 1)
+            await pipe.execute()
+        return 0.0
+
+    async def close(self):
+        await self.redis.aclose()
+
+def create_rate_limiter(kind: str, limit: int, window: float, *, redis_url: str = '',
+                        sqlite_path: str = ''):
+    """Счетчики по названию хранилища: memory, redis или sqlite"""
+    if window <= 0:
+        raise ValueError("THROTTLE_WINDOW должен быть больше нуля")
+    if kind == 'memory':
+        return MemoryRateLimiter(limit, window)
+    if kind == 'redis':
+        from redis.asyncio import Redis
+        return RedisRateLimiter(Redis.from_url(redis_url), limit, window)
+    if kind == 'sqlite':
+        return SQLiteRateLimiter(sqlite_path, limit, window)
+    raise ValueError(f"Неизвестное хранилище ограничений: {kind}")
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Отклонение обновлений сверх лимита (outer middleware на update)"""
+
+    def __init__(self, limiter, allowlist: Iterable[int] = ()):
+        self.limiter = limiter
+        self.allowlist = frozenset(allowlist)
+        # Кого уже предупредили и до какого момента молчать
+        self._warned: Dict[int, float] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        if user is None or user.id in self.allowlist:
+            return await handler(event, data)
+        if isinstance(event, Update) and event.event_type in EXEMPT_UPDATE_TYPES:
+            return await handler(event, data)
+
+        try:
+            retry_after = await self.limiter.hit(user.id)
+        except Exception as e:
+            # Хранилище счетчиков недоступно - не блокируем пользователей
+            logger.error(f"Ошибка проверки частоты обновлений: {e}")
+            retry_after = 0.0
+        if not retry_after:
+            return await handler(event, data)
+
+        metrics.THROTTLED_UPDATES.inc()
+        if self._should_warn(user.id, retry_after):
+            await self._warn(event, retry_after)
+        return None
+
+    def _should_warn(self, user_id: int, retry_after: float) -> bool:
+        now = time.monotonic()
+        if self._warned.get(user_id, 0.0) > now:
+            return False
+        if len(self._warned) >= MAX_TRACKED_USERS:
+            self._warned = {key: until for key, until in self._warned.items() if until > now}
+        self._warned[user_id] = now + retry_after
+        return True
+
+    @staticmethod
+    async def _warn(event: TelegramObject, retry_after: float):
+        # Сообщению - ответ в чат, нажатию кнопки - всплывающая подсказка
+        target = event.event if isinstance(event, Update) else event
+        if not isinstance(target, (Message, CallbackQuery)):
+            return
+        try:
+            await target.answer(f"⏳ Слишком много сообщений. Подождите {max(1, round(retry_after))} с.")
+        except Exception as e:
+            logger.error(f"Не удалось предупредить о частоте сообщений: {e}")
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """Ограничение числа одновременно обрабатываемых обновлений в процессе"""
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
+
+async def serve_webhook(bot: Bot, dp: Dispatcher, *, host: str, port: int, path: str,
+                        secret: str = '', reuse_port: bool = False):
+    """aiohttp-сервер вебхука; работает до SIGTERM/SIGINT"""
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret or None,
+        handle_in_background=True
+    ).register(app, path=path)
+    # Запускает startup/shutdown обработчики диспетчера вместе с приложением
+    setup_application(app, dp, bot=bot)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        # reuse_port: несколько процессов слушают один порт, ядро делит соединения между ними
+        await web.TCPSite(runner, host, port, reuse_port=reuse_port).start()
+        logger.info(f"Вебхук слушает {host}:{port}{path}")
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+def run_webhook(bot: Bot, dp: Dispatcher, *, url: str, host: str, port: int, path: str,
+                secret: str = '', workers: int = 1):
+    """Запуск вебхука в одном или нескольких процессах за одним портом"""
+
+    async def register():
+        try:
+            await bot.set_webhook(url, secret_token=secret or None, drop_pending_updates=True)
+        finally:
+            # Сессию нельзя переносить в дочерние процессы - каждый откроет свою
+            await bot.session.close()
+
+    asyncio.run(register())
+
+    if workers <= 1:
+        asyncio.run(serve_webhook(bot, dp, host=host, port=port, path=path, secret=secret))
+        return
+
+    # fork: процессы наследуют настроенные bot и dp без сериализации
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(
+            target=lambda: asyncio.run(serve_webhook(
+                bot, dp, host=host, port=port, path=path, secret=secret, reuse_port=True
+            )),
+            name=f"webhook-worker-{i}"
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Запущено процессов вебхука: {workers}")
+
+    def stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in processes:
+        process.join()
@@ -0,0 +1,57 @@
+"""Фабрика приложения: несколько независимых приложений в одном процессе"""
+import asyncio
+import datetime
+
+import pytest
+from aiogram.methods import Response, SendMessage
+from aiogram.types import Chat, Message, Update
+
+from exchange_bot import config
+from exchange_bot.app import create_app
+
+TOKEN = '123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA'
+
+@pytest.fixture(autouse=True)
+def local_files(tmp_path, monkeypatch):
+    for name in ('DEALS_QUEUE_PATH', 'SUBSCRIPTIONS_PATH', 'RATES_HISTORY_PATH', 'FSM_SQLITE_PATH',
+                 'THROTTLE_SQLITE_PATH'):
+        monkeypatch.setattr(config, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(config, 'METRICS_PORT', 0)
+
+def capture_replies(app) -> list:
+    """Ответы бота вместо запросов к Telegram"""
+    sent = []
+
+    async def fake_request(make_request, bot, method):
+        if isinstance(method, SendMessage):
+            sent.append(method.text)
+            return Response(ok=True, result=Message(
+                message_id=1, date=datetime.datetime.now(), chat=Chat(id=method.chat_id, type='private')
+            ))
+        return Response(ok=True, result=True)
+
+    app.bot.session.middleware(fake_request)
+    return sent
+
+def message_update(text: str) -> Update:
+    return Update.model_validate({'update_id': 1, 'message': {
+        'message_id': 1, 'date': 0, 'chat': {'id': 5, 'type': 'private'},
+        'from': {'id': 5, 'is_bot': False, 'first_name': 'a'}, 'text': text,
+    }})
+
+def test_create_app_twice():
+    apps = [create_app(TOKEN), create_app(TOKEN)]
+    replies = [capture_replies(app) for app in apps]
+
+    async def scenario():
+        for app in apps:
+            await app.rate_cache.refresh()
+            await app.dp.feed_update(app.bot, message_update('/quote 100 RUB THB'))
+            await app.dp.emit_shutdown(bot=app.bot)
+            await app.bot.session.close()
+
+    asyncio.run(scenario())
+    assert apps[0].dp.sub_routers[0] is not apps[1].dp.sub_routers[0]
+    assert apps[0].dp['route_engine'] is not apps[1].dp['route_engine']
+    for sent in replies:
+        assert len(sent) == 1 and sent[0].startswith('💱 <b>100.00 RUB → 40.01 THB</b>')
@@ -0,0 +1,113 @@
+"""Переходы состояний CircuitBreaker и его работа в RateSource"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from exchange_bot import breaker as breaker_module
+from exchange_bot.breaker import CircuitBreaker
+from exchange_bot.rates import RateSource, RatesUnavailable
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker_module.time, 'monotonic', clock)
+    return clock
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.closed
+
+    assert breaker.allow()
+    breaker.record(False)
+    assert not breaker.closed
+    assert not breaker.allow()
+    assert breaker.retry_in == 30
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.closed
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+
+    clock.now += 29.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    assert breaker.retry_in == 0
+    # Пробует только один вызов, остальные ждут его итога
+    assert breaker.allow()
+    assert not breaker.allow()
+
+def test_successful_probe_closes(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.closed
+    assert breaker.allow()
+    assert breaker.allow()
+
+def test_failed_probe_reopens_for_full_timeout(clock):
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock.now += 45
+    assert breaker.allow()
+    breaker.record(False)
+    assert not breaker.closed
+    assert breaker.retry_in == 30
+    assert not breaker.allow()
+
+class FailingSheet:
+    def __init__(self):
+        self.calls = 0
+
+    def get_values(self, rates_range):
+        self.calls += 1
+        raise ConnectionError("network down")
+
+class SheetsClient:
+    def __init__(self, sheet):
+        self.sheet = sheet
+
+    def worksheet(self):
+        return self.sheet
+
+    def reset(self):
+        pass
+
+def test_rate_source_fails_fast_while_open(clock):
+    sheet = FailingSheet()
+    executor = ThreadPoolExecutor(max_workers=1)
+    source = RateSource(SheetsClient(sheet), 'A2:C20', executor,
+                        breaker=CircuitBreaker('test', failure_threshold=2, reset_timeout=30))
+
+    async def fetch_many(count):
+        for _ in range(count):
+            with pytest.raises(RatesUnavailable):
+                await source.fetch()
+
+    try:
+        asyncio.run(fetch_many(5))
+        # Таблицу читали только до размыкания цепи
+        assert sheet.calls == 2
+        clock.now += 30
+        asyncio.run(fetch_many(1))
+        assert sheet.calls == 3
+    finally:
+        executor.shutdown()
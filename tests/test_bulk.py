@@ -0,0 +1,53 @@
+"""Разбор строк и CSV пакетного расчета"""
+import csv
+
+import pytest
+
+from exchange_bot import bulk
+from exchange_bot.rates import ExchangeRates
+
+@pytest.mark.parametrize('lines, delimiter', [
+    (['50000;2,6', '1 000,5;2.7'], ';'),
+    (['50000\t2,6', '', '70000\t2.5'], '\t'),
+    (['50000,2.6', '70000,2.5'], ','),
+    # Запятая режет дробь - строки разбираются как текст
+    (['50000,2,6', '70000,2.5'], None),
+    (['50000 2,6', '70000 2.5'], None),
+    (['50000 2,6', '70000 2,5'], None),
+    (['50000;2,6', '70000 2.5'], None),
+    ([], None),
+])
+def test_sniff_delimiter(lines, delimiter):
+    assert bulk.sniff_delimiter(lines) == delimiter
+
+def test_split_lines():
+    lines = ['50000;2,6\n', '   \n', '1 000 000 2.7', '70000\t2,5', 'abc']
+    assert list(bulk.split_lines(lines)) == [
+        ['50000', '2,6'], ['1 000 000', '2.7'], ['70000', '2,5'], ['abc'],
+    ]
+
+def test_parse_rows_marks_invalid_lines():
+    rows = bulk.split_text_lines("50 000;2,6\nabc\n70000 x\n1000 2.5")
+    assert list(bulk.parse_rows(rows)) == [(50000.0, 2.6), None, None, (1000.0, 2.5)]
+
+@pytest.mark.parametrize('content', [
+    'сумма;курс\r\n50000;2,6\r\n\r\n25000;2,5\r\n',
+    '﻿50000,2.6\n25000,2.5\n',
+    '50000 2,6\n25 000;2,5\n',
+])
+def test_write_quotes_from_csv(tmp_path, content):
+    source = tmp_path / 'in.csv'
+    source.write_text(content, encoding='utf-8')
+    target = tmp_path / 'out.csv'
+    rates = ExchangeRates(usdt_thb=31.89, rub_usdt=79.50)
+
+    rows = bulk._csv_rows(str(source))
+    count = bulk.write_quotes(rates, 1, rows, str(target), chunk_size=2)
+
+    with open(target, encoding='utf-8', newline='') as f:
+        table = list(csv.reader(f, delimiter=';'))
+    assert count == 2
+    computed = [row for row in table[1:] if not row[-1]]
+    assert [(row[1], row[3]) for row in computed] == [
+        ('50000.0000', '19230.7700'), ('25000.0000', '10000.0000'),
+    ]
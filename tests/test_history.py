@@ -0,0 +1,56 @@
+"""История курсов и поиск по моменту"""
+import pytest
+
+from exchange_bot import pricing
+from exchange_bot.history import HEADER_SIZE, RECORD, RateHistory, RateSnapshot
+from exchange_bot.rates import ExchangeRates
+
+def rates(usdt_thb: float) -> ExchangeRates:
+    return ExchangeRates(usdt_thb=usdt_thb, rub_usdt=79.5)
+
+@pytest.fixture
+def history(tmp_path):
+    history = RateHistory(str(tmp_path / 'history.bin'))
+    for at, usdt_thb in ((100, 31.0), (200, 32.0), (300, 33.0)):
+        history.append(at, rates(usdt_thb))
+    return history
+
+@pytest.mark.parametrize('at, usdt_thb', [
+    (99.9, None), (100, 31.0), (150, 31.0), (200, 32.0), (299.9, 32.0), (300, 33.0), (1e12, 33.0),
+])
+def test_rates_at_returns_snapshot_in_effect(history, at, usdt_thb):
+    snapshot = history.rates_at(at)
+    assert (snapshot and snapshot.usdt_thb) == usdt_thb
+
+def test_rates_at_sees_records_appended_later(history):
+    assert history.rates_at(400).usdt_thb == 33.0
+    history.append(400, rates(34.0))
+    assert history.rates_at(400) == RateSnapshot(400.0, 34.0, 79.5, 0.0025)
+
+def test_time_never_goes_back(history):
+    history.append(250, rates(34.0))
+    assert len(history) == 4
+    assert history.rates_at(299).usdt_thb == 32.0
+    assert history.rates_at(300).usdt_thb == 34.0
+
+def test_torn_tail_is_dropped(history):
+    with open(history.path, 'ab') as f:
+        f.write(b'\x01' * (RECORD.itemsize // 2))
+    history.append(400, rates(34.0))
+    assert len(history) == 4
+    assert history.rates_at(400).usdt_thb == 34.0
+
+def test_empty_history(tmp_path):
+    history = RateHistory(str(tmp_path / 'history.bin'))
+    assert len(history) == 0
+    assert history.rates_at(100) is None
+    assert history.reprice(1, 50000, 2.6, 100) is None
+
+def test_reprice_uses_rates_at_moment(history):
+    assert history.reprice(1, 50000, 2.6, 250) == pricing.rubles_to_baht(rates(32.0), 50000, 2.6)
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'\0' * HEADER_SIZE)
+    with pytest.raises(ValueError):
+        RateHistory(str(path))
@@ -0,0 +1,65 @@
+"""Совпадение скалярных и пакетных расчетов"""
+import random
+
+import numpy as np
+import pytest
+
+from exchange_bot import config, pricing
+from exchange_bot.rates import ExchangeRates
+
+RATES = [
+    ExchangeRates(usdt_thb=31.89, rub_usdt=79.50),
+    ExchangeRates(usdt_thb=35.12, rub_usdt=92.37, commission=0.003),
+]
+
+def _inputs(scenario: int, count: int, seed: int):
+    generator = random.Random(seed)
+    amounts = [round(generator.uniform(0, 100000), 2) for _ in range(count)]
+    if scenario in (1, 2):
+        params = [round(generator.uniform(0.5, 4), generator.choice((1, 2))) for _ in range(count)]
+    else:
+        params = [round(generator.uniform(-100, 5000), 2) for _ in range(count)]
+    # Целые суммы чаще попадают на половину копейки
+    amounts[:count // 4] = [round(amount) for amount in amounts[:count // 4]]
+    amounts[:3] = [0.0, 0.0, 1.0]
+    return amounts, params
+
+@pytest.mark.parametrize('rates', RATES)
+@pytest.mark.parametrize('scenario', sorted(pricing.SCENARIOS))
+def test_batch_matches_scalar(scenario, rates):
+    amounts, params = _inputs(scenario, 5000, seed=scenario)
+    batch = pricing.BATCH_SCENARIOS[scenario](rates, amounts, params)
+    for index, (amount, param) in enumerate(zip(amounts, params)):
+        expected = pricing.SCENARIOS[scenario](rates, amount, param)
+        actual = {name: float(values[index]) for name, values in batch.items()}
+        assert actual == expected, (amount, param)
+
+def test_half_cent_rounds_up_in_both_paths():
+    rates = RATES[0]
+    # 17383.44 / 3.2 = 5432.325 ровно
+    assert pricing.rubles_to_baht(rates, 17383.44, 3.2)['thb_client'] == 5432.33
+    assert pricing.rubles_to_baht_batch(rates, [17383.44], [3.2])['thb_client'][0] == 5432.33
+
+def test_batch_division_by_zero_is_nan():
+    with pytest.raises(ZeroDivisionError):
+        pricing.rubles_to_baht(RATES[0], 1000, 0)
+    batch = pricing.rubles_to_baht_batch(RATES[0], [1000, 1000], [0, 2.5])
+    assert np.isnan(batch['thb_client'][0])
+    assert batch['thb_client'][1] == 400.0
+
+def test_empty_batch_has_columns():
+    assert list(pricing.rubles_to_baht_batch(RATES[0], [], [])) == [
+        'rubles', 'client_rate', 'thb_client', 'profit', 'real_rate'
+    ]
+
+@pytest.mark.parametrize('rounding', config.ROUNDING_MODES)
+def test_batch_matches_scalar_in_every_rounding_mode(monkeypatch, rounding):
+    monkeypatch.setattr(pricing.CONTEXT, 'rounding', rounding)
+    # Свой снимок на режим: коэффициенты снимка кэшируются
+    rates = ExchangeRates(usdt_thb=33.07 + config.ROUNDING_MODES.index(rounding) / 100, rub_usdt=81.2)
+    for scenario in sorted(pricing.SCENARIOS):
+        amounts, params = _inputs(scenario, 1000, seed=10 + scenario)
+        batch = pricing.BATCH_SCENARIOS[scenario](rates, amounts, params)
+        for index, (amount, param) in enumerate(zip(amounts, params)):
+            expected = pricing.SCENARIOS[scenario](rates, amount, param)
+            assert {name: float(values[index]) for name, values in batch.items()} == expected, (amount, param)
@@ -0,0 +1,99 @@
+"""Разбор диапазона курсов из таблицы и кэш курсов"""
+import asyncio
+
+import pytest
+
+from exchange_bot.rates import DEFAULT_RATES, ExchangeRates, RateCache, RatesUnavailable, parse_rates
+
+def test_parse_rates_reads_single_range():
+    rates = parse_rates([
+        ['USDT/THB', '31,89'], ['RUB/USDT', '79.5'], ['Комиссия', '0,3%'],
+        ['EUR/USDT', '1.08', '0.1%'], ['', ''],
+    ])
+    assert (rates.usdt_thb, rates.rub_usdt) == (31.89, 79.5)
+    assert rates.commission == pytest.approx(0.003)
+    assert rates.pairs == {'EUR/USDT': 1.08}
+    assert rates.fees == {'EUR/USDT': pytest.approx(0.001)}
+
+def test_parse_rates_defaults_commission():
+    assert parse_rates([['USDT/THB', '31.89'], ['RUB/USDT', '79.5']]).commission == DEFAULT_RATES.commission
+
+@pytest.mark.parametrize('rows', [
+    [['USDT/THB', '31,89'], ['RUB/USDT', '0'], ['Комиссия', '0.25%']],
+    [['USDT/THB', '-1'], ['RUB/USDT', '79.5']],
+    [['USDT/THB', '31,89'], ['RUB/USDT', '79.5'], ['Комиссия', '25']],
+    [['USDT/THB', 'nan'], ['RUB/USDT', '79.5']],
+    [['USDT/THB', 'inf'], ['RUB/USDT', '79.5']],
+    [['USDT/THB', ''], ['RUB/USDT', '79.5']],
+])
+def test_parse_rates_rejects_invalid_values(rows):
+    with pytest.raises(ValueError):
+        parse_rates(rows)
+
+class SlowFetch:
+    """Источник курсов, который отвечает после released.set()"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.released = None
+
+    async def __call__(self):
+        self.calls += 1
+        await self.released.wait()
+        if self.error is not None:
+            raise self.error
+        return ExchangeRates(usdt_thb=31.89 + self.calls, rub_usdt=79.5)
+
+def test_concurrent_refreshes_share_one_fetch():
+    fetch = SlowFetch()
+    cache = RateCache(60, fetch)
+
+    async def scenario():
+        fetch.released = asyncio.Event()
+        waiters = [asyncio.create_task(cache.refresh()) for _ in range(10)]
+        await asyncio.sleep(0)
+        fetch.released.set()
+        results = await asyncio.gather(*waiters)
+        # Следующее обновление - уже новый запрос
+        await cache.refresh()
+        return results
+
+    results = asyncio.run(scenario())
+    assert fetch.calls == 2
+    assert all(rates is results[0] for rates in results)
+    assert cache.get().usdt_thb == 33.89
+    assert cache.version == 2
+
+def test_failed_refresh_reaches_every_waiter():
+    fetch = SlowFetch(error=ConnectionError("network down"))
+    cache = RateCache(60, fetch)
+
+    async def scenario():
+        fetch.released = asyncio.Event()
+        waiters = [asyncio.create_task(cache.refresh()) for _ in range(5)]
+        await asyncio.sleep(0)
+        fetch.released.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert fetch.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert cache.failing and not cache.ready
+
+def test_cold_cache_schedules_one_refresh():
+    fetch = SlowFetch()
+    cache = RateCache(60, fetch)
+
+    async def scenario():
+        fetch.released = asyncio.Event()
+        for _ in range(3):
+            with pytest.raises(RatesUnavailable):
+                cache.get()
+            await asyncio.sleep(0)
+        fetch.released.set()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert fetch.calls == 1
+    assert cache.ready
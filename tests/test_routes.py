@@ -0,0 +1,76 @@
+"""Граф курсов: ребра из таблицы и лучшие маршруты"""
+import random
+
+import numpy as np
+import pytest
+
+from exchange_bot.rates import ExchangeRates, parse_rates
+from exchange_bot.routes import RateGraph, rate_edges
+
+CURRENCIES = ['AED', 'CNY', 'EUR', 'GBP', 'KZT', 'RUB', 'THB', 'USD', 'USDT', 'VND']
+
+def assert_same_routes(graph: RateGraph, expected: RateGraph):
+    assert graph.currencies == expected.currencies
+    assert np.allclose(graph._distance, expected._distance, rtol=0, atol=1e-9)
+    for source in graph.currencies:
+        for target in graph.currencies:
+            route, best = graph.route(source, target), expected.route(source, target)
+            assert (route is None) == (best is None)
+            if route is not None:
+                assert route.rate == pytest.approx(best.rate, rel=1e-12)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_update_matches_full_recompute(seed):
+    generator = random.Random(seed)
+    prices = {currency: generator.uniform(0.01, 100) for currency in CURRENCIES}
+    edges = {}
+    for a in CURRENCIES:
+        for b in CURRENCIES:
+            if a != b and generator.random() < 0.3:
+                edges[a, b] = prices[b] / prices[a] * (1 - generator.uniform(0.01, 0.05))
+    # Все валюты в графе с самого начала: иначе пересчет будет полным
+    for a, b in zip(CURRENCIES, CURRENCIES[1:]):
+        edges.setdefault((a, b), prices[b] / prices[a] * 0.9)
+
+    graph = RateGraph()
+    graph.update(edges)
+    for _ in range(5):
+        # Курсы только улучшаются, но комиссия остается: арбитража нет
+        improved = dict(edges)
+        for edge in generator.sample(sorted(edges), 4):
+            improved[edge] = min(edges[edge] * generator.uniform(1.0, 1.04),
+                                 prices[edge[1]] / prices[edge[0]] * 0.999)
+        a, b = generator.sample(CURRENCIES, 2)
+        improved.setdefault((a, b), prices[b] / prices[a] * 0.95)
+        graph.update(improved)
+        edges = improved
+
+        expected = RateGraph()
+        expected.update(edges)
+        assert_same_routes(graph, expected)
+
+    assert graph.full_recomputes == 1
+    assert graph.incremental_updates == 5
+
+def test_worse_rate_triggers_full_recompute():
+    graph = RateGraph()
+    graph.update({('RUB', 'USDT'): 0.0125, ('USDT', 'THB'): 31.8, ('RUB', 'THB'): 0.41})
+    assert graph.route('RUB', 'THB').path == ('RUB', 'THB')
+
+    graph.update({('RUB', 'USDT'): 0.0125, ('USDT', 'THB'): 31.8, ('RUB', 'THB'): 0.39})
+    assert graph.full_recomputes == 2
+    assert graph.route('RUB', 'THB').path == ('RUB', 'USDT', 'THB')
+
+def test_rate_edges_apply_pair_fees():
+    rates = ExchangeRates(usdt_thb=32.0, rub_usdt=80.0, commission=0.0,
+                          pairs={'EUR/USDT': 1.1, 'Комиссия': 0.1, 'CNY/USDT': float('nan')},
+                          fees={'EUR/USDT': 0.01})
+    edges = rate_edges(rates)
+    assert edges['EUR', 'USDT'] == pytest.approx(1.1 * 0.99)
+    assert edges['USDT', 'EUR'] == pytest.approx(0.99 / 1.1)
+    assert not any('CNY' in edge for edge in edges)
+
+@pytest.mark.parametrize('fee', ['100%', '2', '-1%'])
+def test_parse_rates_rejects_pair_fee_out_of_range(fee):
+    with pytest.raises(ValueError):
+        parse_rates([['USDT/THB', '32'], ['RUB/USDT', '80'], ['', ''], ['EUR/USDT', '1.1', fee]])
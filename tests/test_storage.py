@@ -0,0 +1,130 @@
+"""SQLite-хранилище FSM и последние расчеты"""
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from exchange_bot import storage as storage_module
+from exchange_bot.storage import CalculationStore, SQLiteCalculationBackend, SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(storage_module.time, 'time', lambda: now[0])
+    return now
+
+def run(storage, *calls):
+    """Выполнить корутины хранилища по очереди и закрыть его"""
+    async def scenario():
+        try:
+            return [await call() for call in calls]
+        finally:
+            await storage.close()
+    return asyncio.run(scenario())
+
+def test_state_and_data_round_trip(tmp_path, now):
+    storage = SQLiteStorage(str(tmp_path / 'fsm.sqlite3'), ttl=60)
+    assert run(
+        storage,
+        lambda: storage.set_state(KEY, 'Scenario:rubles'),
+        lambda: storage.set_data(KEY, {'rubles': 'пятьдесят тысяч'}),
+        lambda: storage.get_state(KEY),
+        lambda: storage.get_data(KEY),
+    )[2:] == ['Scenario:rubles', {'rubles': 'пятьдесят тысяч'}]
+
+def test_state_expires_after_ttl(tmp_path, now):
+    path = str(tmp_path / 'fsm.sqlite3')
+    storage = SQLiteStorage(path, ttl=60)
+    run(storage, lambda: storage.set_state(KEY, 'Scenario:rubles'),
+        lambda: storage.set_data(KEY, {'rubles': 100}))
+
+    now[0] += 59
+    assert run(storage, lambda: storage.get_state(KEY)) == ['Scenario:rubles']
+    now[0] += 2
+    assert run(storage, lambda: storage.get_state(KEY), lambda: storage.get_data(KEY)) == [None, {}]
+
+def test_write_after_expiry_drops_stale_fields(tmp_path, now):
+    storage = SQLiteStorage(str(tmp_path / 'fsm.sqlite3'), ttl=60)
+    run(storage, lambda: storage.set_state(KEY, 'Scenario:rubles'),
+        lambda: storage.set_data(KEY, {'rubles': 100}))
+
+    now[0] += 120
+    # Новое состояние не подхватывает данные брошенного сценария
+    assert run(storage, lambda: storage.set_state(KEY, 'Scenario:baht'),
+               lambda: storage.get_data(KEY)) == [None, {}]
+
+def test_cleared_state_is_not_stored(tmp_path, now):
+    storage = SQLiteStorage(str(tmp_path / 'fsm.sqlite3'))
+    run(storage, lambda: storage.set_state(KEY, 'Scenario:rubles'),
+        lambda: storage.set_state(KEY, None))
+    assert storage._db.execute("SELECT COUNT(*) FROM fsm").fetchone()[0] == 0
+    storage._db.close()
+
+def test_purge_removes_only_expired(tmp_path, now):
+    storage = SQLiteStorage(str(tmp_path / 'fsm.sqlite3'), ttl=60)
+    other = StorageKey(bot_id=1, chat_id=20, user_id=20)
+    run(storage, lambda: storage.set_state(KEY, 'Scenario:rubles'))
+    now[0] += 30
+    run(storage, lambda: storage.set_state(other, 'Scenario:baht'))
+    now[0] += 40
+
+    assert storage.purge_expired() == 1
+    assert run(storage, lambda: storage.get_state(other)) == ['Scenario:baht']
+
+def test_calculations_evict_least_recently_used(now):
+    store = CalculationStore(max_size=2)
+
+    async def scenario():
+        await store.set(1, 1, {'rubles': 1})
+        await store.set(2, 1, {'rubles': 2})
+        # Обращение к 1 делает давним расчет 2 - он и вытесняется
+        await store.get(1)
+        await store.set(3, 1, {'rubles': 3})
+        return [await store.get(user_id) is not None for user_id in (1, 2, 3)]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert len(store) == 2
+
+def test_calculations_expire_after_idle_ttl(now):
+    store = CalculationStore(max_size=10, ttl=60)
+
+    async def scenario():
+        await store.set(1, 1, {'rubles': 1})
+        await store.set(2, 1, {'rubles': 2})
+        now[0] += 50
+        # Чтение продлевает срок
+        assert await store.get(1) is not None
+        now[0] += 50
+        return await store.get(1), await store.get(2)
+
+    first, second = asyncio.run(scenario())
+    assert first.result == {'rubles': 1}
+    assert second is None
+    assert len(store) == 1
+
+def test_backend_restores_evicted_and_persists_access_time(tmp_path, now):
+    backend = SQLiteCalculationBackend(str(tmp_path / 'calc.sqlite3'))
+    store = CalculationStore(max_size=0, ttl=60, backend=backend)
+
+    async def scenario():
+        try:
+            await store.set(1, 2, {'baht': 1000})
+            assert len(store) == 0
+            now[0] += 50
+            restored = await store.get(1)
+            # Время обращения записано и в базу: после перезапуска срок отсчитывается от него
+            now[0] += 50
+            reloaded = await CalculationStore(max_size=0, ttl=60, backend=backend).get(1)
+            now[0] += 61
+            expired = await store.get(1)
+            return restored, reloaded, expired, await backend.load(1)
+        finally:
+            await store.close()
+
+    restored, reloaded, expired, row = asyncio.run(scenario())
+    assert (restored.scenario, restored.result) == (2, {'baht': 1000})
+    assert restored.calculated_at == 1000.0
+    assert reloaded.touched_at == 1100.0
+    assert expired is None and row is None
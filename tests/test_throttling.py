@@ -0,0 +1,65 @@
+"""Скользящее окно ограничения частоты"""
+import asyncio
+
+import pytest
+
+from exchange_bot import throttling
+from exchange_bot.throttling import MIN_RETRY_AFTER, MemoryRateLimiter, SQLiteRateLimiter, window_retry_after
+
+def test_window_allows_below_limit():
+    # Середина интервала: прошлый интервал весит половину
+    assert window_retry_after(10, 10, now=105, previous=10, current=4) == 0
+    assert window_retry_after(10, 10, now=105, previous=0, current=9) == 0
+
+def test_window_retry_within_current_interval():
+    # 10 * (1 - 0.2) + 5 > 10: вес прошлого интервала упадет до половины через 3 с
+    assert window_retry_after(10, 10, now=102, previous=10, current=5) == pytest.approx(3)
+    # Ровно на границе отказ все равно отличается от разрешения
+    assert window_retry_after(10, 10, now=105, previous=10, current=5) == MIN_RETRY_AFTER
+
+def test_window_retry_in_next_interval():
+    # Текущий интервал заполнен: в следующем он станет прошлым с весом (1 - elapsed)
+    assert window_retry_after(10, 10, now=105, previous=0, current=10) == pytest.approx(5)
+    assert window_retry_after(10, 10, now=105, previous=0, current=20) == pytest.approx(10)
+
+def test_window_rejection_is_never_zero():
+    assert window_retry_after(1, 10, now=109.9999999, previous=0, current=1) >= MIN_RETRY_AFTER
+
+def test_memory_limiter_sliding_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(throttling.time, 'monotonic', lambda: now[0])
+    limiter = MemoryRateLimiter(limit=3, window=10)
+
+    async def hits(count):
+        return [await limiter.hit(1) for _ in range(count)]
+
+    assert asyncio.run(hits(3)) == [0, 0, 0]
+    now[0] = 104
+    assert asyncio.run(hits(1)) == [pytest.approx(6)]
+    # Отклоненное обновление не занимает место в окне
+    now[0] = 110
+    assert asyncio.run(hits(4)) == [0, 0, 0, pytest.approx(10)]
+
+def test_sqlite_limiter_counts_across_instances(tmp_path, monkeypatch):
+    now = [1005.0]
+    monkeypatch.setattr(throttling.time, 'time', lambda: now[0])
+    path = str(tmp_path / 'throttle.sqlite3')
+    # Два ограничителя на одном файле - как два процесса вебхука
+    limiters = [SQLiteRateLimiter(path, limit=3, window=10), SQLiteRateLimiter(path, limit=3, window=10)]
+
+    async def hits(*indexes):
+        return [await limiters[index].hit(1) for index in indexes]
+
+    async def close():
+        for limiter in limiters:
+            await limiter.close()
+
+    try:
+        assert asyncio.run(hits(0, 1, 0, 1)) == [0, 0, 0, pytest.approx(5)]
+        # Следующий интервал: прошлый учитывается с весом оставшейся доли окна
+        now[0] = 1015
+        assert asyncio.run(hits(1, 0)) == [0, 0]
+        # 3 * 0.5 + 2 = 3.5: вес прошлого упадет до 1 через 10 * (1 - 1 / 3) - 5 с
+        assert asyncio.run(hits(0)) == [pytest.approx(5 / 3)]
+    finally:
+        asyncio.run(close())